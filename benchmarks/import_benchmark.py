@@ -0,0 +1,59 @@
+"""
+Замер времени импорта template_for_aiogram и первого render-а. Каждый
+замер выполняется в отдельном процессе, т.к. повторный импорт в том же
+процессе ничего не стоит.
+
+Запуск из корня репозитория::
+
+    python -m benchmarks.import_benchmark [количество замеров]
+
+"""
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+TEMPLATE = str(Path(__file__).with_name('render_benchmark.xml'))
+
+MEASURE = '''
+import sys, time
+started = time.perf_counter()
+import template_for_aiogram
+imported = time.perf_counter()
+print(imported - started, 'aiogram' in sys.modules)
+'''
+
+MEASURE_RENDER = '''
+import sys, time
+started = time.perf_counter()
+import template_for_aiogram
+from template import render
+render({template!r}, {{'books': ['Book'], 'book_index': 0, 'page': 1}}, syntax=template_for_aiogram.aiogram_syntax)
+print(time.perf_counter() - started, 'aiogram' in sys.modules)
+'''
+
+
+def _measure(code: str, runs: int) -> tuple[float, bool]:
+    times = []
+    loaded = False
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.split()
+        times.append(float(output[0]))
+        loaded = output[1] == 'True'
+    return statistics.median(times), loaded
+
+
+def main(runs: int = 5):
+    imported, loaded = _measure(MEASURE, runs)
+    rendered, _ = _measure(MEASURE_RENDER.format(template=TEMPLATE), runs)
+
+    print(f'runs:                       {runs}')
+    print(f'import template_for_aiogram: {imported * 1000:.1f} ms (aiogram imported: {loaded})')
+    print(f'import + first render:       {rendered * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,64 @@
+"""
+Замер скорости render-а и потребления памяти на один render.
+
+Запуск из корня репозитория::
+
+    python -m benchmarks.render_benchmark [количество render-ов] [render-ов для подсчёта выделений]
+
+"""
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from template import render
+from template_for_aiogram import aiogram_syntax
+
+TEMPLATE = str(Path(__file__).with_name('render_benchmark.xml'))
+CONTEXT = {
+    'books': [f'Book #{i}' for i in range(20)],
+    'book_index': 3,
+    'page': 12,
+}
+
+
+def _allocations(renders: int) -> float:
+    """ Среднее количество блоков памяти, выделенных за render и занятых
+        к его окончанию (результат render-а ещё не освобождён) """
+    tracemalloc.start()
+    total = 0
+    for _ in range(renders):
+        before = tracemalloc.take_snapshot()
+        result = render(TEMPLATE, CONTEXT, syntax=aiogram_syntax)
+        after = tracemalloc.take_snapshot()
+        total += sum(stat.count_diff for stat in after.compare_to(before, 'traceback') if stat.count_diff > 0)
+        del result
+    tracemalloc.stop()
+    return total / renders
+
+
+def main(renders: int = 2000, traced_renders: int = 50):
+    # Первый render разбирает шаблон, его в замер не включаем
+    render(TEMPLATE, CONTEXT, syntax=aiogram_syntax)
+
+    started = time.perf_counter()
+    for _ in range(renders):
+        render(TEMPLATE, CONTEXT, syntax=aiogram_syntax)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    render(TEMPLATE, CONTEXT, syntax=aiogram_syntax)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Снимки памяти медленные, поэтому выделения считаются на меньшем числе render-ов
+    allocations = _allocations(traced_renders)
+
+    print(f'renders:                {renders}')
+    print(f'time per render:        {elapsed / renders * 1000:.3f} ms')
+    print(f'peak memory per render: {peak / 1024:.1f} KiB')
+    print(f'allocations per render: {allocations:.1f} (over {traced_renders} renders)')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
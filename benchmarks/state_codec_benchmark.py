@@ -0,0 +1,94 @@
+"""
+Сравнение размера состояния компонента и времени кодирования/декодирования
+для JsonStateCodec и BinaryStateCodec (требует msgpack) на нескольких
+типичных компонентах.
+
+Запуск из корня репозитория::
+
+    python -m benchmarks.state_codec_benchmark [количество повторов]
+
+"""
+import datetime
+import sys
+import time
+import uuid
+
+from hulio.core.classes.component import Component
+from hulio.core.classes.state_codec import JsonStateCodec, BinaryStateCodec
+
+
+class Counter(Component, template='counter.xml'):
+    count: int = 0
+
+
+class Catalog(Component, template='catalog.xml'):
+    book_ids: list[uuid.UUID] = []
+    prices: list[float] = []
+    query: str = ''
+
+
+class Schedule(Component, template='schedule.xml'):
+    slots: list[datetime.datetime] = []
+    owner_id: uuid.UUID = None
+    reminders: dict[str, int] = {}
+
+
+def _service_fields(component: Component) -> Component:
+    component.record_id = uuid.uuid4()
+    component.parent_record_id = uuid.uuid4()
+    component.message_record_id = uuid.uuid4()
+    component.bot_id = 123456789
+    return component
+
+
+def _samples() -> list[Component]:
+    now = datetime.datetime(2024, 1, 1, 12, 0)
+    return [
+        _service_fields(Counter(count=42)),
+        _service_fields(Catalog(
+            book_ids=[uuid.uuid4() for _ in range(50)],
+            prices=[i * 1.25 for i in range(50)],
+            query='python'
+        )),
+        _service_fields(Schedule(
+            slots=[now + datetime.timedelta(minutes=30 * i) for i in range(48)],
+            owner_id=uuid.uuid4(),
+            reminders={f'slot-{i}': i * 5 for i in range(10)}
+        )),
+    ]
+
+
+def _measure(function, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return (time.perf_counter() - started) / runs
+
+
+def main(runs: int = 2000):
+    codecs = [JsonStateCodec()]
+    try:
+        codecs.append(BinaryStateCodec())
+    except ImportError as error:
+        print(f'{error}, only json is measured\n')
+
+    print(f'{"component":<10} {"codec":<18} {"size, B":>8} {"encode, us":>11} {"decode, us":>11}')
+
+    for component in _samples():
+        component_class = type(component)
+
+        for codec in codecs:
+            data = codec.encode(component)
+            assert codec.decode(component_class, data).model_dump() == component.model_dump()
+
+            encode = _measure(lambda: codec.encode(component), runs)
+            decode = _measure(lambda: codec.decode(component_class, data), runs)
+
+            print(
+                f'{component_class.__name__:<10} {type(codec).__name__:<18} {len(data):>8} '
+                f'{encode * 1e6:>11.1f} {decode * 1e6:>11.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
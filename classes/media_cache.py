@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Union, Iterable
+
+from aiogram import Bot
+from aiogram.types import InputFile, FSInputFile, Message
+
+import template
+from classes.media_upload import StreamingInputFile
+
+logger = logging.getLogger(__name__)
+
+# Тег медиа в шаблоне -> метод Bot и имя аргумента с файлом
+MEDIA_TAGS = {
+    'photo': ('send_photo', 'photo'),
+    'img': ('send_photo', 'photo'),
+    'image': ('send_photo', 'photo'),
+    'animation': ('send_animation', 'animation'),
+    'video': ('send_video', 'video'),
+    'document': ('send_document', 'document'),
+    'audio': ('send_audio', 'audio'),
+}
+
+
+def _file_hash(path: str, chunk_size: int = 64 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaCache:
+    """
+    Хранит file_id, полученные от Telegram после загрузки локальных файлов,
+    чтобы не загружать один и тот же файл повторно. Файл считается
+    неизменённым, пока не изменились его размер и время модификации, поэтому
+    при отправке сообщения файл не читается.
+
+    Хеш содержимого вычисляется только в фоне, в пуле потоков (см.
+    preload_media): если время модификации изменилось, а содержимое нет,
+    файл не загружается заново.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        :param path: Путь к json-файлу, в котором кеш сохраняется между
+            перезапусками. Если не указан, кеш хранится только в памяти.
+        """
+        self._path = path
+        # Абсолютный путь -> mtime_ns, size, file_id и sha256 (если вычислен)
+        self._entries: dict[str, dict] = {}
+
+        if path is not None and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                entries = json.load(file)
+            # Записи прежнего формата (путь:хеш -> file_id) пропускаются
+            self._entries = {key: entry for key, entry in entries.items() if isinstance(entry, dict)}
+
+    @staticmethod
+    def _signature(path: str) -> tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _matches(entry: dict, signature: tuple[int, int]) -> bool:
+        return (entry['mtime_ns'], entry['size']) == signature
+
+    def get(self, path: str) -> Optional[str]:
+        """ Возвращает file_id загруженного ранее файла """
+        path = os.path.abspath(path)
+        entry = self._entries.get(path)
+        if entry is None or not self._matches(entry, self._signature(path)):
+            return None
+        return entry['file_id']
+
+    def set(self, path: str, file_id: str):
+        """ Запоминает file_id загруженного файла """
+        path = os.path.abspath(path)
+        mtime_ns, size = signature = self._signature(path)
+
+        entry = self._entries.get(path)
+        if entry is not None and entry['file_id'] == file_id and self._matches(entry, signature):
+            return
+
+        self._entries[path] = {'mtime_ns': mtime_ns, 'size': size, 'file_id': file_id, 'sha256': None}
+        self.save()
+
+    async def revalidate(self, path: str) -> Optional[str]:
+        """
+        Проверяет хеш содержимого файла, у которого изменилось время
+        модификации или размер. Если содержимое не изменилось, file_id
+        снова действителен и возвращается. Хеш вычисляется в пуле потоков.
+        Для действительной записи без хеша он вычисляется и запоминается.
+        """
+        path = os.path.abspath(path)
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+
+        signature = self._signature(path)
+        if self._matches(entry, signature) and entry['sha256'] is not None:
+            return entry['file_id']
+
+        digest = await asyncio.get_running_loop().run_in_executor(None, _file_hash, path)
+
+        # Пока хеш вычислялся, запись могла быть заменена
+        if self._entries.get(path) is not entry or self._signature(path) != signature:
+            return None
+
+        if self._matches(entry, signature):
+            entry['sha256'] = digest
+        elif entry['sha256'] == digest:
+            entry['mtime_ns'], entry['size'] = signature
+        else:
+            return None
+
+        self.save()
+        return entry['file_id']
+
+    def save(self):
+        if self._path is None:
+            return
+
+        temporary = f'{self._path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self._entries, file)
+        os.replace(temporary, self._path)
+
+    def resolve(self, src: Union[InputFile, str]) -> Union[InputFile, str]:
+        """
+        Возвращает file_id, если файл уже загружался, StreamingInputFile для
+        локальных файлов, которые ещё не загружались, и src без изменений
+        во всех остальных случаях (url, file_id, прочие InputFile).
+        """
+        if isinstance(src, FSInputFile):
+            return self.get(str(src.path)) or src
+
+        if not isinstance(src, str) or not os.path.isfile(src):
+            return src
+
+        return self.get(src) or StreamingInputFile(src)
+
+
+media_cache: Optional[MediaCache] = None
+
+
+def set_media_cache(cache: Optional[MediaCache]):
+    """ Устанавливает кеш загруженных файлов глобально """
+    global media_cache
+    media_cache = cache
+
+
+def get_media_cache() -> Optional[MediaCache]:
+    """ Возвращает установленный глобально кеш загруженных файлов """
+    return media_cache
+
+
+def resolve_media(src: Union[InputFile, str]) -> Union[InputFile, str]:
+    """ Подставляет file_id загруженного ранее файла, если кеш установлен.
+        Локальные файлы загружаются потоково через StreamingInputFile """
+    if media_cache is None:
+        if isinstance(src, str) and os.path.isfile(src):
+            return StreamingInputFile(src)
+        return src
+    return media_cache.resolve(src)
+
+
+def get_file_id(message: Message) -> Optional[str]:
+    """ Возвращает file_id медиа отправленного сообщения """
+    if message.photo:
+        # Последний размер - оригинальный
+        return message.photo[-1].file_id
+
+    for media in (message.animation, message.video, message.document, message.audio):
+        if media is not None:
+            return media.file_id
+
+    return None
+
+
+def remember_upload(media: Union[InputFile, str], message: Union[Message, bool]) -> Optional[str]:
+    """ Если media - загруженный локальный файл, запоминает его file_id
+        и возвращает его """
+    if media_cache is None or not isinstance(media, FSInputFile) or not isinstance(message, Message):
+        return None
+
+    file_id = get_file_id(message)
+    if file_id is not None:
+        media_cache.set(str(media.path), file_id)
+    return file_id
+
+
+def find_static_media(paths: Iterable[Union[str, Path]], include_tag: str = 'template',
+                      include_attribute: str = 'src') -> dict[str, str]:
+    """ Находит в шаблонах и подключаемых ими шаблонах медиа с локальными
+        файлами, путь к которым не зависит от контекста. Возвращает
+        словарь путь к файлу -> тег """
+    media = {}
+    pending = set(map(os.path.abspath, paths))
+    visited = set()
+
+    while pending:
+        path = pending.pop()
+        visited.add(path)
+        document = template.load_document(path)
+
+        for tag in MEDIA_TAGS:
+            for src in template.find_static_values(document, [tag], 'src'):
+                if os.path.isfile(src):
+                    media.setdefault(src, tag)
+
+        includes = template.find_static_values(document, [include_tag], include_attribute)
+        pending |= set(map(os.path.abspath, includes)) - visited
+
+    return media
+
+
+async def preload_media(bot: Bot, chat_id: Union[int, str], paths: Iterable[Union[str, Path]],
+                        max_concurrency: int = 4) -> dict[str, str]:
+    """
+    Загружает статичные медиа шаблонов в служебный чат и запоминает их
+    file_id в кеше, чтобы первые пользователи не ждали загрузки. Может
+    выполняться при запуске или в фоне. Уже загруженные файлы пропускаются,
+    в том числе изменённые без изменения содержимого, ошибки загрузки записываются в лог и не прерывают остальные загрузки.
+
+    :param bot: Бот, от имени которого загружаются файлы.
+    :param chat_id: Чат, в который отправляются файлы.
+    :param paths: Шаблоны, медиа которых необходимо загрузить.
+    :param max_concurrency: Максимальное количество одновременных загрузок.
+    :return: Словарь путь к файлу -> file_id для загруженных файлов.
+    """
+    if media_cache is None:
+        raise RuntimeError('Media cache is not set, uploaded file_ids would be lost')
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    uploaded = {}
+
+    async def upload(src: str, tag: str):
+        method, argument = MEDIA_TAGS[tag]
+        media = StreamingInputFile(src)
+
+        async with semaphore:
+            try:
+                message = await getattr(bot, method)(chat_id=chat_id, **{argument: media})
+            except Exception as error:
+                logger.warning('Unable to preload "%s": %s', src, error)
+                return
+
+        if file_id := remember_upload(media, message):
+            uploaded[src] = file_id
+            # Хеш нужен, чтобы после изменения времени модификации не загружать файл заново
+            await media_cache.revalidate(src)
+
+    async def preload(src: str, tag: str):
+        if await media_cache.revalidate(src) is None:
+            await upload(src, tag)
+
+    await asyncio.gather(*(
+        preload(src, tag)
+        for src, tag in find_static_media(paths).items()
+    ))
+
+    logger.info('Preloaded %d media files', len(uploaded))
+    return uploaded
+
+
+__all__ = (
+    'MediaCache',
+    'set_media_cache',
+    'get_media_cache',
+    'resolve_media',
+    'get_file_id',
+    'remember_upload',
+    'find_static_media',
+    'preload_media',
+)
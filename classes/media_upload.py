@@ -0,0 +1,127 @@
+import asyncio
+import collections
+import contextlib
+import mmap
+import os
+from typing import AsyncGenerator, Optional
+
+from aiogram import Bot
+from aiogram.types import FSInputFile
+
+metrics = collections.Counter()
+""" Счётчики загрузок: uploads, upload_waits, bytes_uploaded """
+
+
+class UploadLimiter:
+    """
+    Ограничивает количество одновременных загрузок и суммарный размер
+    загружаемых файлов. Размер файла резервируется целиком на время загрузки,
+    т.к. прочитанные через mmap страницы остаются в памяти, пока файл открыт.
+
+    Файл больше бюджета загружается, только когда других загрузок нет,
+    иначе он никогда не смог бы начаться.
+    """
+
+    def __init__(self, max_uploads: int = 4, max_bytes: int = 256 * 1024 * 1024):
+        self.max_uploads = max_uploads
+        self.max_bytes = max_bytes
+
+        self._uploads = 0
+        self._bytes_in_flight = 0
+        self._peak_bytes_in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def bytes_in_flight(self) -> int:
+        """ Суммарный размер файлов, загружаемых в данный момент """
+        return self._bytes_in_flight
+
+    @property
+    def peak_bytes_in_flight(self) -> int:
+        return self._peak_bytes_in_flight
+
+    def _fits(self, size: int) -> bool:
+        if self._uploads == 0:
+            return True
+        return self._uploads < self.max_uploads and self._bytes_in_flight + size <= self.max_bytes
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, size: int):
+        """ Ожидает, пока загрузка файла указанного размера уложится в ограничения """
+        # Condition создаётся лениво, чтобы привязаться к работающему event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        async with self._condition:
+            if not self._fits(size):
+                metrics['upload_waits'] += 1
+                await self._condition.wait_for(lambda: self._fits(size))
+
+            self._uploads += 1
+            self._bytes_in_flight += size
+            self._peak_bytes_in_flight = max(self._peak_bytes_in_flight, self._bytes_in_flight)
+
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._uploads -= 1
+                self._bytes_in_flight -= size
+                self._condition.notify_all()
+
+
+upload_limiter = UploadLimiter()
+
+
+def set_upload_limiter(limiter: UploadLimiter):
+    """ Устанавливает ограничения загрузок глобально """
+    global upload_limiter
+    upload_limiter = limiter
+
+
+def get_upload_limiter() -> UploadLimiter:
+    """ Возвращает установленные глобально ограничения загрузок """
+    return upload_limiter
+
+
+class StreamingInputFile(FSInputFile):
+    """
+    Локальный файл, передаваемый при загрузке частями через mmap, без
+    чтения в память целиком и без копирования частей. Загрузки проходят
+    через глобальный UploadLimiter.
+    """
+
+    async def read(self, bot: Bot) -> AsyncGenerator[memoryview, None]:
+        with open(self.path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+
+            async with upload_limiter.reserve(size):
+                metrics['uploads'] += 1
+
+                if size == 0:
+                    return
+
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    view = memoryview(mapped)
+                    for offset in range(0, size, self.chunk_size):
+                        chunk = view[offset:offset + self.chunk_size]
+                        yield chunk
+                        metrics['bytes_uploaded'] += len(chunk)
+                    del chunk, view
+                finally:
+                    try:
+                        mapped.close()
+                    except BufferError:
+                        # Части ещё удерживаются сетевым слоем, mmap
+                        # закроется сборщиком мусора после их освобождения
+                        pass
+
+
+__all__ = (
+    'metrics',
+    'UploadLimiter',
+    'set_upload_limiter',
+    'get_upload_limiter',
+    'StreamingInputFile',
+)
@@ -1,13 +1,24 @@
-from typing import Optional, Literal, Union, Protocol, Any
+import collections
+import hashlib
+import json
+from typing import Optional, Literal, Union, Protocol, Any, NamedTuple
 
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import InputFile, MessageEntity, InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove, \
     ForceReply, ReplyParameters, LinkPreviewOptions, Message, InputMediaPhoto, InputMediaAnimation, InputMediaVideo, \
     InputMediaDocument, InputMediaAudio
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+
+from classes.media_cache import remember_upload
 
 bot: Bot = ...
 
+metrics = collections.Counter()
+""" Счётчики редактирования: edits, skipped_edits, not_modified и по
+    способам редактирования: edit_reply_markup, edit_text, edit_caption,
+    edit_media, edit_album """
+
 
 # noinspection PyPropertyDefinition
 class IMediaType(Protocol):
@@ -124,7 +135,24 @@ class MeAudio(BaseModel):
         return 'au'
 
 
-MeMediaType = Union[MeLinkPreview, MePhoto, MeAnimation, MeVideo, MeDocument, MeAudio]
+class MeAlbum(BaseModel):
+    """ Группа медиа, отправляемая одним send_media_group. Подпись
+        сообщения становится подписью первого элемента """
+
+    items: list[Union[MePhoto, MeVideo, MeDocument, MeAudio]]
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @property
+    def media(self):
+        return None
+
+    @property
+    def media_type(self):
+        return 'al'
+
+
+MeMediaType = Union[MeLinkPreview, MePhoto, MeAnimation, MeVideo, MeDocument, MeAudio, MeAlbum]
 
 
 class MeMessage(BaseModel):
@@ -137,6 +165,57 @@ class MeMessage(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
 
+def _plain(value: Any, uploaded: dict[int, str]) -> Any:
+    """ Приводит части сообщения к json-совместимому виду. Загруженные
+        файлы представлены полученным file_id, т.к. следующий render
+        подставит именно его (см. media_cache), остальные локальные
+        файлы - именем, как и в media_id """
+    if isinstance(value, InputFile):
+        return uploaded.get(id(value), value.filename)
+    if isinstance(value, BaseModel):
+        return {name: _plain(field, uploaded) for name, field in value if field is not None}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item, uploaded) for item in value]
+    return value
+
+
+def _digest(*parts: Any, uploaded: dict[int, str] = None) -> str:
+    data = json.dumps(_plain(parts, uploaded or {}), default=str, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(data.encode(), digest_size=8).hexdigest()
+
+
+class MessageFingerprint(NamedTuple):
+    """ Хеши частей отправленного сообщения. Позволяет определить,
+        изменилось ли сообщение, не храня его целиком """
+
+    text: str
+    markup: str
+    media: str
+
+    @classmethod
+    def of(cls, message: MeMessage, uploaded: dict[int, str] = None) -> 'MessageFingerprint':
+        """ uploaded - file_id загруженных файлов по id() их InputFile """
+        media = message.media
+        return cls(
+            text=_digest(message.text, message.entities, message.parse_mode),
+            markup=_digest(message.reply_markup),
+            media=_digest(None if media is None else media.media_type, media, uploaded=uploaded)
+        )
+
+    def pack(self) -> str:
+        return ':'.join(self)
+
+    def changed(self, previous: Optional['MessageFingerprint']) -> set[str]:
+        """ Части, отличающиеся от previous. Если previous неизвестен - все """
+        if previous is None:
+            return set(self._fields)
+        return {name for name, a, b in zip(self._fields, self, previous) if a != b}
+
+    @classmethod
+    def unpack(cls, data: str) -> 'MessageFingerprint':
+        return cls(*data.split(':'))
+
+
 class MessageEditor(BaseModel):
     """
     Класс для упрощённой отправки и редактирования сообщений.
@@ -146,6 +225,11 @@ class MessageEditor(BaseModel):
     - Медиа представлено как url или file_id и url или file_id изменились
     - Медиа представлено как InputFile и filename изменился
     - Или параметр force_edit_media установлен на True
+
+    Отпечаток последнего отправленного состояния хранится в `fingerprint`,
+    редактирование, которое ничего не меняет, не выполняется. По частям
+    отпечатка выбирается самый дешёвый запрос: только клавиатура, только
+    подпись или медиа. Выбранный способ доступен в `last_edit_method`.
     """
 
     media_type: Optional[Literal[
@@ -155,13 +239,36 @@ class MessageEditor(BaseModel):
         'a',  # Animation
         'v',  # Video
         'd',  # Document
-        'au'  # Audio
+        'au',  # Audio
+        'al'  # Album
     ]] = Field(init_var=False, default=None)
     media_id: Optional[str] = Field(init_var=False, default=None)  # url, file_id or filename
     is_input_file: Optional[bool] = Field(init_var=False, default=None)  # If true, media_id is filename
 
     chat_id: Optional[Union[int, str]] = Field(init_var=False, default=None)
-    message_id: Optional[int] = Field(init_var=False, default=None)
+    message_id: Optional[int] = Field(init_var=False, default=None)  # For albums - id of the first message
+
+    album_media_ids: Optional[list[str]] = Field(init_var=False, default=None)  # url, file_id or filename
+    album_message_ids: Optional[list[int]] = Field(init_var=False, default=None)
+
+    fingerprint: Optional[str] = Field(init_var=False, default=None)  # See MessageFingerprint
+
+    _last_edit_method: Optional[str] = PrivateAttr(default=None)
+    _uploaded: dict[int, str] = PrivateAttr(default_factory=dict)  # See _remember_upload
+
+    @property
+    def last_edit_method(self) -> Optional[str]:
+        """ Способ последнего редактирования: reply_markup, text, caption, media,
+            album или None, если редактирование было пропущено """
+        return self._last_edit_method
+
+    def _remember_upload(self, media: Union[InputFile, str], telegram_message: Union[Message, bool]) -> Optional[str]:
+        """ Запоминает file_id загруженного файла, в том числе для отпечатка
+            отправленного состояния """
+        file_id = remember_upload(media, telegram_message)
+        if file_id is not None:
+            self._uploaded[id(media)] = file_id
+        return file_id
 
     def _set_media_id(self, media: Union[InputFile, str]) -> None:
         if isinstance(media, InputFile):
@@ -173,6 +280,75 @@ class MessageEditor(BaseModel):
         else:
             raise TypeError('Invalid media')
 
+    @staticmethod
+    def _media_key(media: Union[InputFile, str]) -> str:
+        if isinstance(media, InputFile):
+            return media.filename
+        return media
+
+    @staticmethod
+    def _input_media(media: IMediaType, caption: Optional[str], caption_entities: Optional[list[MessageEntity]],
+                     parse_mode: Optional[str]):
+        if isinstance(media, MePhoto):
+            return InputMediaPhoto(
+                media=media.photo,
+                has_spoiler=media.has_spoiler,
+                caption=caption,
+                caption_entities=caption_entities,
+                parse_mode=parse_mode
+            )
+
+        if isinstance(media, MeAnimation):
+            return InputMediaAnimation(
+                media=media.animation,
+                thumbnail=media.thumbnail,
+                width=media.width,
+                height=media.height,
+                duration=media.duration,
+                has_spoiler=media.has_spoiler,
+                caption=caption,
+                caption_entities=caption_entities,
+                parse_mode=parse_mode
+            )
+
+        if isinstance(media, MeVideo):
+            return InputMediaVideo(
+                media=media.video,
+                thumbnail=media.thumbnail,
+                width=media.width,
+                height=media.height,
+                duration=media.duration,
+                supports_streaming=media.supports_streaming,
+                has_spoiler=media.has_spoiler,
+                caption=caption,
+                caption_entities=caption_entities,
+                parse_mode=parse_mode
+            )
+
+        if isinstance(media, MeDocument):
+            return InputMediaDocument(
+                media=media.document,
+                thumbnail=media.thumbnail,
+                disable_content_type_detection=media.disable_content_type_detection,
+                caption=caption,
+                caption_entities=caption_entities,
+                parse_mode=parse_mode
+            )
+
+        if isinstance(media, MeAudio):
+            return InputMediaAudio(
+                media=media.audio,
+                thumbnail=media.thumbnail,
+                duration=media.duration,
+                performer=media.performer,
+                title=media.title,
+                caption=caption,
+                caption_entities=caption_entities,
+                parse_mode=parse_mode
+            )
+
+        raise NotImplementedError('Unknown media type')
+
     def _is_media_needs_to_be_edited(self, media: Optional[IMediaType]):
         if self.media_type != media.media_type:
             return True
@@ -196,6 +372,8 @@ class MessageEditor(BaseModel):
             protect_content: Optional[bool] = None,
             reply_parameters: Optional[ReplyParameters] = None
     ) -> Message:
+        self._uploaded.clear()
+
         parameters = {
             'chat_id': chat_id,
             'message_thread_id': message_thread_id,
@@ -336,11 +514,42 @@ class MessageEditor(BaseModel):
                 **parameters
             )
 
+        elif isinstance(message.media, MeAlbum):
+            if message.reply_markup is not None:
+                raise ValueError('Album cannot have a keyboard')
+
+            self.media_type = 'al'
+
+            telegram_messages = await bot.send_media_group(
+                media=[
+                    self._input_media(
+                        item,
+                        *((message.text, message.entities, message.parse_mode) if i == 0 else (None, None, None))
+                    )
+                    for i, item in enumerate(message.media.items)
+                ],
+                **parameters
+            )
+
+            self.album_media_ids = [
+                self._remember_upload(item.media, telegram_message) or self._media_key(item.media)
+                for item, telegram_message in zip(message.media.items, telegram_messages)
+            ]
+            self.album_message_ids = [telegram_message.message_id for telegram_message in telegram_messages]
+
+            telegram_message = telegram_messages[0]
+
         else:
             raise NotImplementedError('Unknown media type')
 
+        # Локальный файл загружен, дальше используется его file_id
+        if message.media is not None and (file_id := self._remember_upload(message.media.media, telegram_message)):
+            self._set_media_id(file_id)
+
         self.chat_id = telegram_message.chat.id
         self.message_id = telegram_message.message_id
+        self.fingerprint = MessageFingerprint.of(message, self._uploaded).pack()
+        self._uploaded.clear()
 
         return telegram_message
 
@@ -349,14 +558,64 @@ class MessageEditor(BaseModel):
             message: MeMessage,
             force_edit_media: bool = False
     ) -> Union[Message, bool]:
+        """ Редактирует сообщение. Если отпечаток нового состояния совпадает
+            с отправленным, запрос не выполняется и возвращается False """
+        fingerprint = MessageFingerprint.of(message)
+        previous = None if self.fingerprint is None else MessageFingerprint.unpack(self.fingerprint)
+        changed = fingerprint.changed(previous)
+
+        if not force_edit_media and not changed:
+            metrics['skipped_edits'] += 1
+            self._last_edit_method = None
+            return False
+
+        self._uploaded.clear()
+        try:
+            result = await self._edit(message, changed, previous is not None, force_edit_media)
+        except TelegramBadRequest as error:
+            # Отпечатка ещё не было, а сообщение уже в этом состоянии
+            if 'message is not modified' not in error.message:
+                raise
+            metrics['not_modified'] += 1
+            result = False
+        else:
+            metrics['edits'] += 1
+            metrics[f'edit_{self._last_edit_method}'] += 1
+
+        # Загруженные файлы следующий render подставит как file_id
+        if self._uploaded:
+            fingerprint = MessageFingerprint.of(message, self._uploaded)
+            self._uploaded.clear()
+
+        self.fingerprint = fingerprint.pack()
+        return result
+
+    async def _edit(
+            self,
+            message: MeMessage,
+            changed: set[str],
+            is_diff_known: bool,
+            force_edit_media: bool = False
+    ) -> Union[Message, bool]:
+        """ changed - изменившиеся части отпечатка, is_diff_known - был ли
+            известен отпечаток предыдущего состояния """
         parameters = {
             'chat_id': self.chat_id,
             'message_id': self.message_id,
             'inline_message_id': None
         }
 
+        # Изменилась только клавиатура, текст и медиа не отправляются заново
+        if changed == {'markup'} and not force_edit_media and self.media_type != 'al':
+            self._last_edit_method = 'reply_markup'
+            return await bot.edit_message_reply_markup(
+                reply_markup=message.reply_markup,
+                **parameters
+            )
+
         if self.media_type in ('nm', 'lp') and message.media is None:
             self.media_type = 'nm'
+            self._last_edit_method = 'text'
 
             return await bot.edit_message_text(
                 link_preview_options=LinkPreviewOptions(
@@ -372,6 +631,7 @@ class MessageEditor(BaseModel):
 
         if self.media_type in ('nm', 'lp') and isinstance(message.media, MeLinkPreview):
             self.media_type = 'lp'
+            self._last_edit_method = 'text'
 
             # noinspection DuplicatedCode
             return await bot.edit_message_text(
@@ -399,6 +659,10 @@ class MessageEditor(BaseModel):
                 **parameters
             )
 
+        if self.media_type == 'al' or isinstance(message.media, MeAlbum):
+            self._last_edit_method = 'album'
+            return await self._edit_album(message, 'text' in changed or not is_diff_known, force_edit_media)
+
         # Message with no media can only be edited to have LinkPreview
         if self.media_type in ('nm', 'lp'):
             raise ValueError(
@@ -406,13 +670,20 @@ class MessageEditor(BaseModel):
                 'Message without media can only be edited to have a link preview'
             )
 
-        # Media cannot be removed, except cases above, so we just keep it
+        # Media cannot be removed, except cases above, so we just keep it.
+        #   Besides the file itself, media attributes (spoiler, thumbnail...)
+        #   may have changed, which is only seen in the fingerprint
         if message.media is not None:
-            edit_media = force_edit_media or self._is_media_needs_to_be_edited(message.media)
+            edit_media = (
+                force_edit_media
+                or self._is_media_needs_to_be_edited(message.media)
+                or is_diff_known and 'media' in changed
+            )
         else:
             edit_media = False
 
         if not edit_media:
+            self._last_edit_method = 'caption'
             return await bot.edit_message_caption(
                 caption=message.text,
                 caption_entities=message.entities,
@@ -421,99 +692,80 @@ class MessageEditor(BaseModel):
                 **parameters
             )
 
-        if isinstance(message.media, MePhoto):
-            self.media_type = 'p'
+        self.media_type = message.media.media_type
+        self._last_edit_method = 'media'
+        input_media = self._input_media(message.media, message.text, message.entities, message.parse_mode)
 
-            return await bot.edit_message_media(
-                media=InputMediaPhoto(
-                    media=message.media.photo,
-                    has_spoiler=message.media.has_spoiler,
-                    caption=message.text,
-                    caption_entities=message.entities,
-                    parse_mode=message.parse_mode
-                ),
-                reply_markup=message.reply_markup,
-                **parameters
-            )
+        result = await bot.edit_message_media(
+            media=input_media,
+            reply_markup=message.reply_markup,
+            **parameters
+        )
 
-        if isinstance(message.media, MeAnimation):
-            self.media_type = 'a'
+        # Локальный файл загружен, дальше используется его file_id
+        self._set_media_id(self._remember_upload(message.media.media, result) or message.media.media)
 
-            return await bot.edit_message_media(
-                media=InputMediaAnimation(
-                    media=message.media.animation,
-                    thumbnail=message.media.thumbnail,
-                    width=message.media.width,
-                    height=message.media.height,
-                    duration=message.media.duration,
-                    has_spoiler=message.media.has_spoiler,
-                    caption=message.text,
-                    caption_entities=message.entities,
-                    parse_mode=message.parse_mode
-                ),
-                reply_markup=message.reply_markup,
-                **parameters
-            )
+        return result
 
-        if isinstance(message.media, MeVideo):
-            self.media_type = 'v'
+    async def _edit_album(self, message: MeMessage, edit_caption: bool = True,
+                          force_edit_media: bool = False) -> Union[Message, bool]:
+        """ Альбом нельзя превратить в обычное сообщение и наоборот, а количество
+            элементов альбома изменить нельзя. Подпись хранится в первом сообщении
+            альбома, медиа редактируются только у изменившихся элементов, подпись -
+            только если изменилась (edit_caption) """
+        if self.media_type != 'al' or not isinstance(message.media, MeAlbum):
+            raise ValueError('Album can only be edited to be another album')
 
-            return await bot.edit_message_media(
-                media=InputMediaVideo(
-                    media=message.media.video,
-                    thumbnail=message.media.thumbnail,
-                    width=message.media.width,
-                    height=message.media.height,
-                    duration=message.media.duration,
-                    supports_streaming=message.media.supports_streaming,
-                    has_spoiler=message.media.has_spoiler,
-                    caption=message.text,
-                    caption_entities=message.entities,
-                    parse_mode=message.parse_mode
-                ),
-                reply_markup=message.reply_markup,
-                **parameters
-            )
+        if len(message.media.items) != len(self.album_message_ids):
+            raise ValueError('Number of items in the album cannot be changed')
 
-        if isinstance(message.media, MeDocument):
-            self.media_type = 'd'
+        if message.reply_markup is not None:
+            raise ValueError('Album cannot have a keyboard')
 
-            return await bot.edit_message_media(
-                media=InputMediaDocument(
-                    media=message.media.document,
-                    thumbnail=message.media.thumbnail,
-                    disable_content_type_detection=message.media.disable_content_type_detection,
-                    caption=message.text,
-                    caption_entities=message.entities,
-                    parse_mode=message.parse_mode
-                ),
-                reply_markup=message.reply_markup,
-                **parameters
-            )
+        result = None
+        edited = None
 
-        if isinstance(message.media, MeAudio):
-            self.media_type = 'au'
+        for i, (item, message_id) in enumerate(zip(message.media.items, self.album_message_ids)):
+            if not force_edit_media and self._media_key(item.media) == self.album_media_ids[i]:
+                continue
 
-            return await bot.edit_message_media(
-                media=InputMediaAudio(
-                    media=message.media.audio,
-                    thumbnail=message.media.thumbnail,
-                    duration=message.media.duration,
-                    performer=message.media.performer,
-                    title=message.media.title,
-                    caption=message.text,
-                    caption_entities=message.entities,
-                    parse_mode=message.parse_mode
-                ),
-                reply_markup=message.reply_markup,
-                **parameters
+            caption = (message.text, message.entities, message.parse_mode) if i == 0 else (None, None, None)
+            telegram_message = await bot.edit_message_media(
+                media=self._input_media(item, *caption),
+                chat_id=self.chat_id,
+                message_id=message_id
             )
+            self.album_media_ids[i] = self._remember_upload(item.media, telegram_message) or self._media_key(item.media)
+            edited = telegram_message
 
-        raise NotImplementedError('Unknown media type')
+            if i == 0:
+                result = telegram_message
+
+        # Подпись первого элемента уже обновлена вместе с его медиа
+        if result is not None:
+            return result
+
+        if not edit_caption:
+            return edited if edited is not None else False
+
+        return await bot.edit_message_caption(
+            chat_id=self.chat_id,
+            message_id=self.album_message_ids[0],
+            caption=message.text,
+            caption_entities=message.entities,
+            parse_mode=message.parse_mode
+        )
 
     async def delete(self):
-        if await bot.delete_message(self.chat_id, self.message_id):
+        if self.media_type == 'al':
+            deleted = await bot.delete_messages(self.chat_id, self.album_message_ids)
+        else:
+            deleted = await bot.delete_message(self.chat_id, self.message_id)
+
+        if deleted:
             self.chat_id = None
             self.message_id = None
+            self.album_message_ids = None
+            self.fingerprint = None
             return True
         return False
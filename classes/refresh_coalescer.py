@@ -0,0 +1,121 @@
+import asyncio
+import collections
+import logging
+from typing import Awaitable, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingRefresh:
+    __slots__ = ('edit', 'future')
+
+    def __init__(self, edit: Callable[[], Awaitable], future: asyncio.Future):
+        self.edit = edit
+        self.future = future
+
+
+class RefreshCoalescer:
+    """
+    Объединяет обновления одного сообщения. Первое обновление выполняется
+    сразу; запросы, пришедшие, пока оно выполняется, объединяются в одно
+    следующее редактирование. Выполняется всегда последняя переданная
+    функция, поэтому сообщение получает последнее состояние.
+
+    Если задано окно `window` (секунды), каждое редактирование откладывается
+    на это время, и запросы, пришедшие за него, тоже объединяются. По
+    умолчанию окна нет.
+
+    Ошибки редактирования передаются в возвращаемый future и пишутся в лог,
+    даже если его никто не ждёт.
+
+    Счётчики requests, edits и coalesced доступны в `metrics`.
+    """
+
+    def __init__(self, window: float = 0):
+        self.window = window
+        self.metrics = collections.Counter()
+
+        self._pending: dict[Hashable, _PendingRefresh] = {}
+        self._workers: dict[Hashable, asyncio.Task] = {}
+
+    def request(self, key: Hashable, edit: Callable[[], Awaitable]) -> asyncio.Future:
+        """ Запрашивает обновление сообщения key функцией edit. Возвращает
+            future, который завершится после редактирования, включающего
+            этот запрос """
+        self.metrics['requests'] += 1
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.metrics['coalesced'] += 1
+            pending.edit = edit
+            return pending.future
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(self._log_failure)
+        self._pending[key] = _PendingRefresh(edit, future)
+
+        # Пока работает обработчик ключа, он сам подберёт новый запрос
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._work(key))
+
+        return future
+
+    def discard(self, key: Hashable):
+        """ Отменяет ожидающее обновление, например, перед удалением сообщения """
+        pending = self._pending.pop(key, None)
+        if pending is not None:
+            pending.future.cancel()
+
+    def is_pending(self, key: Hashable) -> bool:
+        return key in self._pending
+
+    async def _work(self, key: Hashable):
+        try:
+            while key in self._pending:
+                if self.window:
+                    await asyncio.sleep(self.window)
+
+                pending: Optional[_PendingRefresh] = self._pending.pop(key, None)
+                if pending is None:
+                    continue  # Отменено за время окна
+
+                self.metrics['edits'] += 1
+                try:
+                    await pending.edit()
+                except asyncio.CancelledError:
+                    pending.future.cancel()
+                    raise
+                except Exception as error:
+                    if not pending.future.done():
+                        pending.future.set_exception(error)
+                else:
+                    if not pending.future.done():
+                        pending.future.set_result(None)
+        finally:
+            del self._workers[key]
+
+    @staticmethod
+    def _log_failure(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error('Unable to refresh message', exc_info=future.exception())
+
+
+refresh_coalescer = RefreshCoalescer()
+
+
+def set_refresh_coalescer(coalescer: RefreshCoalescer):
+    """ Устанавливает объединение обновлений глобально """
+    global refresh_coalescer
+    refresh_coalescer = coalescer
+
+
+def get_refresh_coalescer() -> RefreshCoalescer:
+    """ Возвращает установленное глобально объединение обновлений """
+    return refresh_coalescer
+
+
+__all__ = (
+    'RefreshCoalescer',
+    'set_refresh_coalescer',
+    'get_refresh_coalescer',
+)
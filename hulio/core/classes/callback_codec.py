@@ -0,0 +1,189 @@
+"""
+CallbackCodec - Кодирование callback_data кнопок компонентов.
+
+Telegram ограничивает callback_data 64 байтами, поэтому данные кнопки
+упаковываются в бинарный вид и кодируются в base64url:
+
+    prefix sep base64url( record_id | action | header | args )
+
+    record_id - UUID компонента, 16 байт
+    action    - номер действия из реестра компонентов, 4 байта
+    header    - количество аргументов << 1 | признак вынесенных аргументов, varint
+    args      - аргументы: длина (varint) + utf-8 каждого, либо 8-байтовый
+                токен, если аргументы не поместились и вынесены в таблицу
+                на стороне сервера
+
+Таблица вынесенных аргументов ограничена по размеру и хранится в памяти,
+поэтому кнопки с вынесенными аргументами перестают работать после
+перезапуска или вытеснения записи.
+"""
+import base64
+import collections
+import functools
+import hashlib
+import secrets
+import typing as t
+import uuid
+
+from hulio.core.classes.component_registry import ComponentRegistry, ACTION_INDEX_SIZE
+
+MAX_CALLBACK_DATA = 64
+SPILL_TOKEN_SIZE = 8
+
+
+class CallbackData(t.NamedTuple):
+    record_id: uuid.UUID
+    component_id: str
+    action_id: str
+    args: tuple[str, ...]
+
+
+def _write_varint(buffer: bytearray, value: int):
+    while value >= 0x80:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+@functools.lru_cache(maxsize=4096)
+def _unpack(payload: str) -> t.Optional[tuple[uuid.UUID, int, bool, t.Union[bytes, tuple[str, ...]]]]:
+    """ Разбирает base64url-часть callback_data. Для вынесенных аргументов
+        вместо них возвращает токен. Возвращает None, если данные некорректны """
+    try:
+        data = base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4))
+
+        offset = 16 + ACTION_INDEX_SIZE
+        if len(data) < offset:
+            return None
+
+        record_id = uuid.UUID(bytes=data[:16])
+        action = int.from_bytes(data[16:offset], 'big')
+        header, offset = _read_varint(data, offset)
+        count, spilled = header >> 1, bool(header & 1)
+
+        if spilled:
+            token = data[offset:offset + SPILL_TOKEN_SIZE]
+            if len(token) != SPILL_TOKEN_SIZE or offset + SPILL_TOKEN_SIZE != len(data):
+                return None
+            return record_id, action, True, token
+
+        args = []
+        for _ in range(count):
+            length, offset = _read_varint(data, offset)
+            if offset + length > len(data):
+                return None
+            args.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+
+        if offset != len(data):
+            return None
+
+        return record_id, action, False, tuple(args)
+    except (ValueError, IndexError, UnicodeDecodeError):
+        return None
+
+
+class CallbackCodec:
+    """ Кодирует и декодирует callback_data кнопок компонентов """
+
+    def __init__(self, registry: ComponentRegistry, prefix: str = 'h', separator: str = ':',
+                 spill_size: int = 10_000):
+        """
+        :param registry: Реестр, из которого берутся номера действий.
+        :param prefix: Префикс, отличающий кнопки компонентов от прочих.
+        :param spill_size: Максимальное количество наборов аргументов, вынесенных
+            в таблицу на стороне сервера. Дольше всего не использовавшиеся
+            вытесняются первыми.
+        """
+        self._registry = registry
+        self._head = f'{prefix}{separator}'
+        self._spill_size = spill_size
+        self._spilled: collections.OrderedDict[bytes, tuple[str, ...]] = collections.OrderedDict()
+        # Ключ хеша токенов, чтобы токены нельзя было вычислить снаружи
+        self._spill_key = secrets.token_bytes(16)
+
+        # Максимальная длина бинарной части, после base64 укладывающаяся в лимит
+        self._max_payload = (MAX_CALLBACK_DATA - len(self._head.encode())) * 3 // 4
+
+    def _spill(self, args: tuple[str, ...]) -> bytes:
+        """ Выносит аргументы в таблицу. Токен - хеш аргументов, поэтому
+            повторный render той же кнопки использует ту же запись """
+        data = bytearray()
+        for arg in args:
+            encoded = arg.encode('utf-8')
+            _write_varint(data, len(encoded))
+            data += encoded
+        token = hashlib.blake2b(data, digest_size=SPILL_TOKEN_SIZE, key=self._spill_key).digest()
+
+        if token in self._spilled:
+            self._spilled.move_to_end(token)
+            return token
+
+        self._spilled[token] = args
+        while len(self._spilled) > self._spill_size:
+            self._spilled.popitem(last=False)
+        return token
+
+    def encode(self, record_id: uuid.UUID, component_id: str, action_id: str, *args: t.Any) -> str:
+        """ Возвращает callback_data для кнопки действия компонента """
+        args = tuple(map(str, args))
+
+        data = bytearray(record_id.bytes)
+        data += self._registry.action_index(component_id, action_id).to_bytes(ACTION_INDEX_SIZE, 'big')
+        prefix_size = len(data)
+
+        _write_varint(data, len(args) << 1)
+        for arg in args:
+            encoded = arg.encode('utf-8')
+            _write_varint(data, len(encoded))
+            data += encoded
+
+        if len(data) > self._max_payload:
+            del data[prefix_size:]
+            _write_varint(data, len(args) << 1 | 1)
+            data += self._spill(args)
+
+        return self._head + base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+    def decode(self, callback_data: t.Optional[str]) -> t.Optional[CallbackData]:
+        """ Разбирает callback_data. Возвращает None для чужих, некорректных
+            и устаревших данных """
+        if not callback_data or not callback_data.startswith(self._head):
+            return None
+
+        unpacked = _unpack(callback_data[len(self._head):])
+        if unpacked is None:
+            return None
+
+        record_id, action, spilled, args = unpacked
+
+        action = self._registry.action_by_index(action)
+        if action is None:
+            return None
+
+        if spilled:
+            token = args
+            args = self._spilled.get(token)
+            if args is None:
+                return None
+            self._spilled.move_to_end(token)
+
+        return CallbackData(record_id, *action, args)
+
+
+__all__ = (
+    'CallbackData',
+    'CallbackCodec',
+    'MAX_CALLBACK_DATA',
+)
@@ -3,9 +3,13 @@ import uuid
 
 from aiogram.exceptions import TelegramAPIError
 from aiogram.types import ReplyParameters, Chat
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
-from hulio.core.contexts import current_component, current_chat
+from hulio.core import glob
+from hulio.core.contexts import current_component, current_bot, current_chat
+
+PAGINATE_ACTION = '__paginate__'
+DEFAULT_PAGED_KEYBOARD = 'default'
 
 
 class Component(BaseModel):
@@ -22,9 +26,35 @@ class Component(BaseModel):
 
     bot_id: int = Field(init_var=False, default=None)
 
+    # Текущие страницы <paged-keyboard> по имени клавиатуры
+    paged_keyboard_pages: dict[str, int] = Field(init_var=False, default_factory=dict)
+
+    # Состояние в том виде, в котором оно последний раз прочитано из хранилища
+    # или записано в него. По нему ComponentCache находит изменённые поля, в
+    # том числе изменённые на месте, например `self.books.append(book)`
+    _stored_state: t.Union[str, bytes, None] = PrivateAttr(default=None)
+    # Поля этого состояния, если они уже разобраны (см. StateCodec.fields)
+    _stored_fields: t.Optional[dict[str, t.Any]] = PrivateAttr(default=None)
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+    @property
+    def stored_state(self) -> t.Union[str, bytes, None]:
+        """ Последнее записанное состояние. None - неизвестно, тогда при
+            сохранении состояние записывается целиком """
+        return self._stored_state
+
+    @property
+    def stored_fields(self) -> t.Optional[dict[str, t.Any]]:
+        return self._stored_fields
+
+    def mark_stored(self, state: t.Union[str, bytes, None], fields: dict[str, t.Any] = None):
+        """ Запоминает состояние, записанное в хранилище или прочитанное из
+            него, и, если они известны, его разобранные поля """
+        self._stored_state = state
+        self._stored_fields = fields
+
     def __init_subclass__(cls, component_id: str = None, template: str = None, **kwargs):
         if component_id is None:
             component_id = cls.__name__
@@ -32,6 +62,7 @@ class Component(BaseModel):
 
         if template is None:
             raise ValueError('Шаблон должен быть указан при наследовании от Component.')
+        cls._template = template
 
     @property
     def is_tracked(self):
@@ -94,7 +125,8 @@ class Component(BaseModel):
             'record_id': _record_id,
             'chat_id': chat_id,
             'message_thread_id': message_thread_id,
-            'reply_parameters': reply_parameters
+            'reply_parameters': reply_parameters,
+            'paginate': self.__paginate_callback_data(_record_id)
         }
 
         _message = self.__render__(context)
@@ -118,10 +150,70 @@ class Component(BaseModel):
         if not self._is_static and self._focus_by_default:
             await self.__focus()
 
+    def __paginate_callback_data(self, record_id: t.Optional[uuid.UUID]):
+        """ Возвращает функцию, создающую callback_data кнопок навигации <paged-keyboard> """
+        if record_id is None:
+            return None
+
+        def paginate(page: int, keyboard: str = DEFAULT_PAGED_KEYBOARD) -> str:
+            return glob.callback_codec.encode(record_id, self.get_component_id(), PAGINATE_ACTION, page, keyboard)
+
+        return paginate
+
+    async def refresh(self):
+        """ Перерисовывает сообщение компонента по текущему состоянию. Как и
+            send, использует __render__ и message компонента """
+        context = {
+            'record_id': self.record_id,
+            'paginate': self.__paginate_callback_data(self.record_id)
+        }
+
+        _message = self.__render__(context)
+
+        try:
+            await self.message.edit(bot=current_bot.get(None), message=_message)
+        except TelegramAPIError as error:
+            self.__unable_refresh__(error)
+
+    def __unable_send__(self, exception: TelegramAPIError):
+        """ Переопределяемый. Вызывается, если сообщение не удалось отправить """
+        raise exception
+
+    def __unable_refresh__(self, exception: TelegramAPIError):
+        """ Переопределяемый. Вызывается, если сообщение не удалось изменить """
+        raise exception
+
+    def paged_keyboard_page(self, keyboard: str = DEFAULT_PAGED_KEYBOARD) -> int:
+        """ Текущая страница <paged-keyboard> с именем keyboard """
+        return self.paged_keyboard_pages.get(keyboard, 0)
+
+    async def __paginate__(self, args: list[str]):
+        """ Встроенное действие кнопок навигации <paged-keyboard>. Номер
+            страницы и имя клавиатуры приходят в callback_data, поэтому
+            текущая страница не читается из хранилища. После перехода
+            сообщение перерисовывается. Некорректные данные игнорируются """
+        try:
+            page = int(args[0])
+        except (IndexError, ValueError):
+            return
+        if page < 0:
+            return
+
+        keyboard = args[1] if len(args) > 1 else DEFAULT_PAGED_KEYBOARD
+        if self.paged_keyboard_page(keyboard) == page:
+            return
+
+        self.paged_keyboard_pages[keyboard] = page
+        await self.refresh()
+
     @classmethod
     def get_component_id(cls):
         return cls._component_id
 
+    @classmethod
+    def get_template(cls):
+        return cls._template
+
 
 # class Component(BaseModel):
 #     _component_id: t.ClassVar[str]
@@ -319,4 +411,6 @@ class Component(BaseModel):
 
 __all__ = (
     'Component',
+    'PAGINATE_ACTION',
+    'DEFAULT_PAGED_KEYBOARD',
 )
@@ -0,0 +1,173 @@
+import collections
+import typing as t
+import uuid
+
+from hulio.core.classes.state_codec import StateCodec, JsonStateCodec, find_state_codec
+from hulio.core.interfaces.database import IDatabaseController, ComponentRecord, MessageRecord
+
+if t.TYPE_CHECKING:
+    from hulio.core.classes.component import Component
+
+# Поля компонента, которые также являются колонками ComponentRecord
+RECORD_COLUMNS = frozenset({'parent_record_id', 'message_record_id', 'is_enabled'})
+
+_MISSING = object()
+
+
+class ComponentCache(IDatabaseController):
+    """
+    Хранилище с ограниченным LRU-кешем живых объектов компонентов по record_id.
+    Пока компонент в кеше, обработчики получают тот же объект и не разбирают
+    state_json заново. Запись проходит в хранилище сразу, при прекращении
+    отслеживания компонента или его сообщения объект удаляется из кеша.
+
+    Состояние записывается кодеком `codec`, а читается любым известным
+    кодеком. Компонент, записанный другим кодеком или по старой схеме,
+    при следующем сохранении перезаписывается целиком.
+
+    Счётчики hits, misses, evictions, invalidations, writes, skipped_writes
+    и migrations доступны в `metrics`.
+    """
+
+    def __init__(self, storage: IDatabaseController, max_size: int = 1024, codec: StateCodec = None):
+        self.storage = storage
+        self.max_size = max_size
+        self.codec = codec or JsonStateCodec()
+        self.metrics = collections.Counter()
+        self._components: collections.OrderedDict[uuid.UUID, 'Component'] = collections.OrderedDict()
+
+    # Кеш объектов ----------------------------------------------------
+
+    def get(self, record_id: uuid.UUID) -> t.Optional['Component']:
+        """ Возвращает объект компонента, если он есть в кеше """
+        component = self._components.get(record_id)
+
+        if component is None:
+            self.metrics['misses'] += 1
+            return None
+
+        self.metrics['hits'] += 1
+        self._components.move_to_end(record_id)
+        return component
+
+    def put(self, component: 'Component'):
+        """ Добавляет объект компонента в кеш """
+        self._components[component.record_id] = component
+        self._components.move_to_end(component.record_id)
+
+        while len(self._components) > self.max_size:
+            self._components.popitem(last=False)
+            self.metrics['evictions'] += 1
+
+    def invalidate(self, record_id: uuid.UUID):
+        """ Удаляет объект компонента из кеша """
+        if self._components.pop(record_id, None) is not None:
+            self.metrics['invalidations'] += 1
+
+    def load(self, record: ComponentRecord, component_class: type['Component']) -> 'Component':
+        """ Создаёт объект компонента по записи из хранилища и добавляет его в кеш """
+        data = record.state_json
+        codec = self.codec if self.codec.accepts(data) else find_state_codec(data)
+        component = codec.decode(component_class, data)
+
+        # Записанное другим кодеком или по старой схеме состояние при
+        # следующем сохранении перезаписывается целиком
+        if codec is self.codec and codec.is_current(component_class, data):
+            component.mark_stored(data)
+        else:
+            self.metrics['migrations'] += 1
+
+        self.put(component)
+        return component
+
+    def save(self, component: 'Component', storage: IDatabaseController = None):
+        """ Записывает изменённые поля компонента в хранилище (по умолчанию - в
+            обёрнутое). Изменения находятся сравнением закодированного
+            состояния с последним записанным, поэтому замечаются и изменения
+            списков и словарей на месте. Если ничего не изменилось, запись
+            не выполняется """
+        self.put(component)
+
+        state = self.codec.encode(component)
+        stored = component.stored_state
+        if state == stored:
+            self.metrics['skipped_writes'] += 1
+            return
+
+        storage = storage or self.storage
+        fields = type(component).model_fields
+
+        current = None
+        if stored is None:
+            dirty, patch = set(fields), None
+        else:
+            current = self.codec.fields(state)
+            previous = component.stored_fields
+            if previous is None:
+                previous = self.codec.fields(stored)
+            dirty = {name for name, value in current.items() if previous.get(name, _MISSING) != value}
+            patch = {name: current[name] for name in dirty}
+
+        # Служебные поля хранятся ещё и в отдельных колонках
+        values = {name: getattr(component, name) for name in dirty & RECORD_COLUMNS}
+
+        # Если изменилось всё, частичное обновление ничего не даёт
+        patched = False
+        if self.codec.supports_patch and patch is not None and len(dirty) < len(fields):
+            try:
+                storage.component_patch(component.record_id, values, patch)
+                patched = True
+            except NotImplementedError:
+                pass
+
+        if not patched:
+            storage.component_patch(component.record_id, {**values, 'state_json': state})
+
+        # Только после успешной записи, иначе изменения будут записаны в следующий раз
+        component.mark_stored(state, current)
+        self.metrics['writes'] += 1
+
+    # IDatabaseController -------------------------------------------
+
+    def setup(self):
+        self.storage.setup()
+
+    def component_track(self, record: ComponentRecord):
+        self.storage.component_track(record)
+
+    def component_untrack(self, record_id: uuid.UUID):
+        self.storage.component_untrack(record_id)
+        self.invalidate(record_id)
+
+    def component_update(self, record: ComponentRecord):
+        self.storage.component_update(record)
+
+    def component_patch(self, record_id: uuid.UUID, values: dict[str, t.Any], state_patch: dict[str, t.Any] = None):
+        self.storage.component_patch(record_id, values, state_patch)
+
+    def component_focus(self, bot_id: int, chat_id: int, user_id: int, record_id: t.Optional[uuid.UUID]):
+        self.storage.component_focus(bot_id, chat_id, user_id, record_id)
+
+    def component_get_focused(self, bot_id: int, chat_id: int, user_id: int) -> t.Optional[ComponentRecord]:
+        return self.storage.component_get_focused(bot_id, chat_id, user_id)
+
+    def component_get(self, record_id: uuid.UUID) -> t.Optional[ComponentRecord]:
+        return self.storage.component_get(record_id)
+
+    def message_track(self, record: MessageRecord):
+        self.storage.message_track(record)
+
+    def message_untrack(self, record_id: uuid.UUID):
+        self.storage.message_untrack(record_id)
+
+        for component_record_id, component in list(self._components.items()):
+            if component.message_record_id == record_id:
+                self.invalidate(component_record_id)
+
+    def message_get(self, record_id: uuid.UUID) -> MessageRecord:
+        return self.storage.message_get(record_id)
+
+
+__all__ = (
+    'ComponentCache',
+)
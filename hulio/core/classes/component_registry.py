@@ -9,6 +9,17 @@ ComponentRegistry - Реестр компонентов.
 приходит callback data, реестр там нигде не указывается, и если бы реестры могли
 содержать компоненты с одинаковыми ИД - возникла бы неопределённость
 """
+import hashlib
+import typing as t
+
+ACTION_INDEX_SIZE = 4
+
+
+def _action_index(component_id: str, action_id: str) -> int:
+    """ Номер действия - хеш его ИД, поэтому он не зависит от порядка
+        регистрации компонентов и действий """
+    digest = hashlib.blake2b(f'{component_id}\0{action_id}'.encode(), digest_size=ACTION_INDEX_SIZE).digest()
+    return int.from_bytes(digest, 'big')
 
 
 class ComponentLazyProxy:
@@ -37,6 +48,12 @@ class ComponentRegistry:
         self._debug_name = debug_name
         self._components = {}
 
+        # Номера действий используются в callback_data вместо строковых ИД.
+        # Номер вычисляется из ИД, поэтому кнопки, отправленные до перезапуска,
+        # продолжают работать и после добавления или перестановки компонентов
+        self._actions: dict[int, tuple[str, str]] = {}
+        self._action_indexes: dict[tuple[str, str], int] = {}
+
     def register(self, component_id: str, component):
         """ Регистрирует компонент в системе """
         if component_id in self._components:
@@ -59,3 +76,32 @@ class ComponentRegistry:
             if default is None:
                 return None
             raise
+
+    def register_action(self, component_id: str, action_id: str) -> int:
+        """ Регистрирует действие компонента и возвращает его номер """
+        key = component_id, action_id
+        if key in self._action_indexes:
+            return self._action_indexes[key]
+
+        index = _action_index(component_id, action_id)
+        if index in self._actions:
+            other_component_id, other_action_id = self._actions[index]
+            raise ValueError(
+                f'Action "{action_id}" of component "{component_id}" has the same index as '
+                f'action "{other_action_id}" of component "{other_component_id}", rename one of them'
+            )
+
+        self._action_indexes[key] = index
+        self._actions[index] = key
+        return index
+
+    def action_index(self, component_id: str, action_id: str) -> int:
+        """ Возвращает номер зарегистрированного действия """
+        try:
+            return self._action_indexes[component_id, action_id]
+        except KeyError:
+            raise KeyError(f'Action "{action_id}" of component "{component_id}" is not registered') from None
+
+    def action_by_index(self, index: int) -> t.Optional[tuple[str, str]]:
+        """ Возвращает (component_id, action_id) по номеру действия """
+        return self._actions.get(index)
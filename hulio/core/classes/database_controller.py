@@ -4,10 +4,20 @@ import typing as t
 from hulio.core.interfaces.database import IDatabaseController, IDatabaseProvider, ComponentRecord, MessageRecord
 
 
+# Ключ записи в таблице фокуса вычисляется из (bot_id, chat_id, user_id),
+# поэтому компонент в фокусе находится одним чтением по ключу
+FOCUS_NAMESPACE = uuid.UUID('5f0c2f3e-8a54-4c8e-9a1f-6b1d3c0e7a21')
+
+
+def focus_key(bot_id: int, chat_id: int, user_id: int) -> uuid.UUID:
+    return uuid.uuid5(FOCUS_NAMESPACE, f'{bot_id}:{chat_id}:{user_id}')
+
+
 class DatabaseController(IDatabaseController):
     schema_name = 'hulio'
     component_table_name = 'component'
     message_table_name = 'message'
+    focus_table_name = 'focus'
 
     def __init__(self, provider: IDatabaseProvider):
         self.provider = provider
@@ -19,7 +29,7 @@ class DatabaseController(IDatabaseController):
             'parent_record_id': t.Optional[uuid.UUID],
             'message_record_id': uuid.UUID,
             'component_id': str,
-            'state_json': str,
+            'state_json': t.Union[str, bytes],
             'is_enabled': bool
         })
         self.provider.ensure_table(self.schema_name, self.message_table_name, {
@@ -31,6 +41,49 @@ class DatabaseController(IDatabaseController):
             'media_id': str,
             'media_type': str
         })
+        self.provider.ensure_table(self.schema_name, self.focus_table_name, {
+            'record_id': uuid.UUID,
+            'component_record_id': uuid.UUID
+        })
+
+    def _focus_owner(self, message_record_id: uuid.UUID) -> t.Optional[tuple[int, int, int]]:
+        """ (bot_id, chat_id, user_id) сообщения """
+        message = self.provider.get(
+            self.schema_name, self.message_table_name,
+            message_record_id,
+            columns=['bot_id', 'chat_id', 'user_id']
+        )
+        return None if message is None else tuple(message)
+
+    def _focused_record_id(self, owner: tuple[int, int, int]) -> t.Optional[uuid.UUID]:
+        focused = self.provider.get(
+            self.schema_name, self.focus_table_name, focus_key(*owner), columns=['component_record_id']
+        )
+        return None if focused is None else focused[0]
+
+    def _refocus(self, owner: tuple[int, int, int]):
+        """ Передаёт фокус включенному компоненту последнего сообщения
+            пользователя. Если такого нет, фокус снимается """
+        bot_id, chat_id, user_id = owner
+        where = {'bot_id': bot_id, 'chat_id': chat_id, 'user_id': user_id}
+
+        record_id = None
+        if self.provider.exists(self.schema_name, self.message_table_name, where=where):
+            message_record_id, = self.provider.select(
+                self.schema_name, self.message_table_name,
+                columns=['record_id'],
+                where=where,
+                last_inserted=True
+            )
+            enabled = self.provider.select(
+                self.schema_name, self.component_table_name,
+                columns=['record_id'],
+                where={'message_record_id': message_record_id, 'is_enabled': True}
+            )
+            if enabled:
+                record_id, = enabled[-1]
+
+        self.component_focus(bot_id, chat_id, user_id, record_id)
 
     def component_track(self, record: ComponentRecord):
         self.provider.insert(self.schema_name, self.component_table_name, record.record_id, {
@@ -42,48 +95,100 @@ class DatabaseController(IDatabaseController):
             'is_enabled': record.is_enabled
         })
 
+        # Последний отслеживаемый компонент получает фокус
+        if record.is_enabled and (owner := self._focus_owner(record.message_record_id)) is not None:
+            self._set_focus(focus_key(*owner), record.record_id)
+
     def component_untrack(self, record_id: uuid.UUID):
         message_record_id, = self.provider.get(
             self.schema_name, self.component_table_name,
             record_id,
             columns=['message_record_id']
         )
+        owner = self._focus_owner(message_record_id)
 
         self.provider.delete(self.schema_name, self.component_table_name, record_id)
 
-        if self.provider.exists(self.schema_name, self.component_table_name, where={'message_record_id': message_record_id}):
-            return
+        if not self.provider.exists(self.schema_name, self.component_table_name, where={'message_record_id': message_record_id}):
+            self.provider.delete(self.schema_name, self.message_table_name, message_record_id)
 
-        self.provider.delete(self.schema_name, self.message_table_name, message_record_id)
+        # Фокус возвращается, например, родителю закрытого дочернего компонента
+        if owner is not None and self._focused_record_id(owner) == record_id:
+            self._refocus(owner)
 
     def component_update(self, record: ComponentRecord):
-        self.provider.update(self.schema_name, self.component_table_name, {
+        self.component_patch(record.record_id, {
             'parent_record_id': record.parent_record_id,
             'message_record_id': record.message_record_id,
             'state_json': record.state_json,
             'is_enabled': record.is_enabled
-        }, record.record_id)
+        })
 
-    def component_get_focused(self, bot_id: int, chat_id: int, user_id: int) -> ComponentRecord:
-        message_record_id, = self.provider.select(
-            self.schema_name, self.message_table_name,
-            columns=['record_id'],
-            where={'bot_id': bot_id, 'chat_id': chat_id, 'user_id': user_id},
-            last_inserted=True
-        )
+    def component_patch(self, record_id: uuid.UUID, values: dict[str, t.Any], state_patch: dict[str, t.Any] = None):
+        """ Записывает только переданные колонки. state_patch - изменённые ключи
+            state_json, применяются провайдером (см. IDatabaseProvider.patch_json).
+            Если провайдер этого не умеет, ничего не записывается и возникает
+            NotImplementedError """
+        if state_patch is not None:
+            self.provider.patch_json(self.schema_name, self.component_table_name, 'state_json', state_patch, record_id)
 
-        columns = ['record_id', 'parent_record_id', 'message_record_id', 'component_id', 'state_json', 'is_enabled']
-        component = self.provider.select(
-            self.schema_name, self.component_table_name,
-            columns=columns,
-            where={'message_record_id': message_record_id, 'is_enabled': True}
-        )
+        if values:
+            self.provider.update(self.schema_name, self.component_table_name, values, record_id)
 
-        return ComponentRecord(
-            **dict(zip(columns, component))  # dict(zip(['a', 'b'], [1, 2]) -> {'a': 1, 'b': 2}
+        if 'is_enabled' not in values:
+            return
+
+        message_record_id = values.get('message_record_id')
+        if message_record_id is None:
+            message_record_id, = self.provider.get(
+                self.schema_name, self.component_table_name, record_id, columns=['message_record_id']
+            )
+        owner = self._focus_owner(message_record_id)
+        if owner is None:
+            return
+
+        focused = self._focused_record_id(owner)
+        if values['is_enabled']:
+            # Снова включенный компонент, например, родитель закрытого дочернего,
+            # может получить фокус, если его ни у кого нет
+            if focused is None:
+                self._refocus(owner)
+        elif focused == record_id:
+            # Отключенный компонент не может быть в фокусе
+            self._refocus(owner)
+
+    def _set_focus(self, key: uuid.UUID, record_id: uuid.UUID):
+        if self.provider.get(self.schema_name, self.focus_table_name, key, columns=['record_id']) is None:
+            self.provider.insert(self.schema_name, self.focus_table_name, key, {
+                'record_id': key,
+                'component_record_id': record_id
+            })
+        else:
+            self.provider.update(self.schema_name, self.focus_table_name, {
+                'component_record_id': record_id
+            }, key)
+
+    def component_focus(self, bot_id: int, chat_id: int, user_id: int, record_id: t.Optional[uuid.UUID]):
+        key = focus_key(bot_id, chat_id, user_id)
+
+        if record_id is not None:
+            self._set_focus(key, record_id)
+        elif self.provider.get(self.schema_name, self.focus_table_name, key, columns=['record_id']) is not None:
+            self.provider.delete(self.schema_name, self.focus_table_name, key)
+
+    def component_get_focused(self, bot_id: int, chat_id: int, user_id: int) -> t.Optional[ComponentRecord]:
+        focused = self.provider.get(
+            self.schema_name, self.focus_table_name,
+            focus_key(bot_id, chat_id, user_id),
+            columns=['component_record_id']
         )
 
-    def component_get(self, record_id: uuid.UUID) -> ComponentRecord:
+        if focused is None:
+            return None
+
+        return self.component_get(focused[0])
+
+    def component_get(self, record_id: uuid.UUID) -> t.Optional[ComponentRecord]:
         columns = ['record_id', 'parent_record_id', 'message_record_id', 'component_id', 'state_json', 'is_enabled']
         component = self.provider.get(
             self.schema_name, self.component_table_name,
@@ -91,6 +196,10 @@ class DatabaseController(IDatabaseController):
             columns=columns
         )
 
+        # Компонент больше не отслеживается, либо record_id из устаревших данных
+        if component is None:
+            return None
+
         return ComponentRecord(
             **dict(zip(columns, component))  # dict(zip(['a', 'b'], [1, 2]) -> {'a': 1, 'b': 2}
         )
@@ -106,6 +215,18 @@ class DatabaseController(IDatabaseController):
             'media_type': record.media_type
         })
 
+    def message_get(self, record_id: uuid.UUID) -> MessageRecord:
+        columns = ['record_id', 'bot_id', 'chat_id', 'user_id', 'message_id', 'media_id', 'media_type']
+        message = self.provider.get(
+            self.schema_name, self.message_table_name,
+            record_id,
+            columns=columns
+        )
+
+        return MessageRecord(
+            **dict(zip(columns, message))
+        )
+
     def message_untrack(self, record_id: uuid.UUID):
         component_record_ids = self.provider.select(
             self.schema_name, self.component_table_name,
@@ -113,6 +234,12 @@ class DatabaseController(IDatabaseController):
             where={'message_record_id': record_id}
         )
 
+        owner = self._focus_owner(record_id)
+        focused = None if owner is None else self._focused_record_id(owner)
+
         self.provider.delete(self.schema_name, self.message_table_name, record_id)
         for (component_record_id,) in component_record_ids:
             self.provider.delete(self.schema_name, self.component_table_name, component_record_id)
+
+        if focused is not None and [focused] in component_record_ids:
+            self._refocus(owner)
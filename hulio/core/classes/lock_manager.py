@@ -0,0 +1,118 @@
+import asyncio
+import collections
+import contextlib
+import time
+import typing as t
+
+
+class _KeyLock:
+    __slots__ = ('locked', 'waiters', 'references')
+
+    def __init__(self):
+        self.locked = False
+        self.waiters: collections.deque[asyncio.Future] = collections.deque()
+        self.references = 0  # Владелец и ожидающие
+
+
+class LockManager:
+    """
+    Блокировки по ключу (record_id компонента). Блокировка создаётся при
+    первом захвате и удаляется, когда её больше никто не держит и не ждёт,
+    поэтому таблица содержит только используемые ключи. Ожидающие получают
+    блокировку строго по очереди: при освобождении она передаётся первому
+    из них напрямую. Разные ключи друг друга не блокируют.
+
+    Счётчики acquisitions, contended_acquisitions и wait_time (секунды,
+    суммарно) доступны в `metrics`.
+    """
+
+    def __init__(self):
+        self.metrics = collections.Counter()
+        self._locks: dict[t.Hashable, _KeyLock] = {}
+        self._peak_queue_length = 0
+
+    @property
+    def active_keys(self) -> int:
+        """ Количество ключей, которые сейчас удерживаются или ожидаются """
+        return len(self._locks)
+
+    @property
+    def peak_queue_length(self) -> int:
+        return self._peak_queue_length
+
+    def queue_length(self, key: t.Hashable) -> int:
+        """ Количество задач, ожидающих блокировку ключа """
+        lock = self._locks.get(key)
+        return 0 if lock is None else len(lock.waiters)
+
+    @contextlib.asynccontextmanager
+    async def lock(self, key: t.Hashable) -> t.AsyncIterator[bool]:
+        """ Удерживает блокировку ключа. Возвращает True, если её пришлось ждать """
+        waited = await self.acquire(key)
+        try:
+            yield waited
+        finally:
+            self.release(key)
+
+    async def acquire(self, key: t.Hashable) -> bool:
+        """ Захватывает блокировку ключа. Возвращает True, если её пришлось ждать """
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = _KeyLock()
+
+        lock.references += 1
+        self.metrics['acquisitions'] += 1
+
+        if not lock.locked:
+            lock.locked = True
+            return False
+
+        self.metrics['contended_acquisitions'] += 1
+
+        waiter = asyncio.get_running_loop().create_future()
+        lock.waiters.append(waiter)
+        self._peak_queue_length = max(self._peak_queue_length, len(lock.waiters))
+
+        started = time.perf_counter()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Блокировка уже была передана, отдаём её следующему
+                self.release(key)
+            else:
+                if waiter in lock.waiters:
+                    lock.waiters.remove(waiter)
+                self._dereference(key, lock)
+            raise
+        finally:
+            self.metrics['wait_time'] += time.perf_counter() - started
+
+        return True
+
+    def release(self, key: t.Hashable):
+        """ Освобождает блокировку ключа, передавая её первому ожидающему """
+        lock = self._locks.get(key)
+        if lock is None or not lock.locked:
+            raise RuntimeError(f'Lock {key!r} is not acquired')
+
+        while lock.waiters:
+            waiter = lock.waiters.popleft()
+            if not waiter.done():
+                # Блокировка остаётся захваченной, теперь ей владеет waiter
+                waiter.set_result(None)
+                break
+        else:
+            lock.locked = False
+
+        self._dereference(key, lock)
+
+    def _dereference(self, key: t.Hashable, lock: _KeyLock):
+        lock.references -= 1
+        if lock.references == 0:
+            del self._locks[key]
+
+
+__all__ = (
+    'LockManager',
+)
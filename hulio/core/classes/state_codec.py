@@ -0,0 +1,170 @@
+import datetime
+import decimal
+import enum
+import functools
+import hashlib
+import json
+import operator
+import typing as t
+import uuid
+
+if t.TYPE_CHECKING:
+    from hulio.core.classes.component import Component
+
+# Двоичное состояние начинается с байта 0xC1, который не используется ни
+# в msgpack, ни в utf-8, поэтому его нельзя спутать с json. Второй байт -
+# версия формата
+BINARY_MAGIC = b'\xc1\x01'
+FINGERPRINT_SIZE = 4
+
+
+@functools.lru_cache(maxsize=None)
+def schema_fingerprint(component_class: type['Component']) -> bytes:
+    """ Отпечаток набора полей компонента и их типов. Меняется при
+        добавлении, удалении или изменении типа поля """
+    fields = sorted(
+        (name, repr(field.annotation))
+        for name, field in component_class.model_fields.items()
+    )
+    return hashlib.blake2b(repr(fields).encode(), digest_size=FINGERPRINT_SIZE).digest()
+
+
+class StateCodec:
+    """
+    Формат, в котором состояние компонента хранится в колонке state_json.
+    `supports_patch` означает, что состояние можно обновлять по ключам
+    через IDatabaseProvider.patch_json.
+    """
+
+    supports_patch: bool = False
+
+    def accepts(self, data: t.Union[str, bytes]) -> bool:
+        """ Может ли кодек прочитать данные """
+        raise NotImplementedError
+
+    def is_current(self, component_class: type['Component'], data: t.Union[str, bytes]) -> bool:
+        """ Записаны ли данные по текущей схеме компонента """
+        return True
+
+    def encode(self, component: 'Component') -> t.Union[str, bytes]:
+        raise NotImplementedError
+
+    def decode(self, component_class: type['Component'], data: t.Union[str, bytes]) -> 'Component':
+        raise NotImplementedError
+
+    def fields(self, data: t.Union[str, bytes]) -> dict[str, t.Any]:
+        """ Значения полей в том виде, в котором они хранятся, без проверки
+            моделью. Нужны для сравнения состояний """
+        raise NotImplementedError
+
+
+class JsonStateCodec(StateCodec):
+    """ Состояние в виде json-текста pydantic. Используется по умолчанию """
+
+    supports_patch = True
+
+    def accepts(self, data: t.Union[str, bytes]) -> bool:
+        return not (isinstance(data, bytes) and data.startswith(BINARY_MAGIC))
+
+    def encode(self, component: 'Component') -> str:
+        return component.model_dump_json()
+
+    def decode(self, component_class: type['Component'], data: t.Union[str, bytes]) -> 'Component':
+        return component_class.model_validate_json(data)
+
+    def fields(self, data: t.Union[str, bytes]) -> dict[str, t.Any]:
+        return json.loads(data)
+
+
+def _iso_format(value: t.Union[datetime.date, datetime.time]) -> str:
+    return value.isoformat()
+
+
+# Преобразования значений, которых нет в msgpack. Обратно их преобразует
+# pydantic при проверке модели: 16 байт - в UUID, строки ISO - в дату
+_ENCODERS: dict[type, t.Callable[[t.Any], t.Any]] = {
+    uuid.UUID: operator.attrgetter('bytes'),
+    datetime.datetime: _iso_format,
+    datetime.date: _iso_format,
+    datetime.time: _iso_format,
+    decimal.Decimal: str,
+    set: list,
+    frozenset: list,
+}
+
+
+def _encode_value(value: t.Any) -> t.Any:
+    try:
+        return _ENCODERS[type(value)](value)
+    except KeyError:
+        pass
+
+    if isinstance(value, enum.Enum):
+        return value.value
+    for value_type, encoder in _ENCODERS.items():
+        if isinstance(value, value_type):
+            return encoder(value)
+
+    raise TypeError(f'Cannot encode {type(value).__name__} in component state')
+
+
+class BinaryStateCodec(StateCodec):
+    """
+    Компактное двоичное состояние: BINARY_MAGIC, отпечаток схемы и поля
+    компонента в msgpack. UUID хранятся 16 байтами, а не строкой. Требует
+    пакет msgpack.
+
+    Поля хранятся по именам, поэтому данные, записанные по старой схеме,
+    по-прежнему читаются - отпечаток лишь показывает, что их стоит
+    перезаписать. UUID в полях типа t.Any читаются как bytes.
+    """
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError('BinaryStateCodec requires msgpack, install it with "pip install msgpack"') from None
+        self._packer = msgpack.Packer(default=_encode_value, use_bin_type=True)
+        self._unpackb = functools.partial(msgpack.unpackb, raw=False, strict_map_key=False)
+
+    def accepts(self, data: t.Union[str, bytes]) -> bool:
+        return isinstance(data, bytes) and data.startswith(BINARY_MAGIC)
+
+    def is_current(self, component_class: type['Component'], data: t.Union[str, bytes]) -> bool:
+        offset = len(BINARY_MAGIC)
+        return data[offset:offset + FINGERPRINT_SIZE] == schema_fingerprint(component_class)
+
+    def encode(self, component: 'Component') -> bytes:
+        payload = self._packer.pack(component.model_dump())
+        return BINARY_MAGIC + schema_fingerprint(type(component)) + payload
+
+    def decode(self, component_class: type['Component'], data: t.Union[str, bytes]) -> 'Component':
+        return component_class.model_validate(self.fields(data))
+
+    def fields(self, data: t.Union[str, bytes]) -> dict[str, t.Any]:
+        return self._unpackb(memoryview(data)[len(BINARY_MAGIC) + FINGERPRINT_SIZE:])
+
+
+_json_codec = JsonStateCodec()
+_binary_codec: t.Optional[BinaryStateCodec] = None
+
+
+def find_state_codec(data: t.Union[str, bytes]) -> StateCodec:
+    """ Возвращает кодек, которым были записаны данные """
+    global _binary_codec
+
+    if not _json_codec.accepts(data):
+        if _binary_codec is None:
+            _binary_codec = BinaryStateCodec()
+        return _binary_codec
+
+    return _json_codec
+
+
+__all__ = (
+    'schema_fingerprint',
+    'StateCodec',
+    'JsonStateCodec',
+    'BinaryStateCodec',
+    'find_state_codec',
+)
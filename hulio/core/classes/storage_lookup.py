@@ -0,0 +1,114 @@
+import typing as t
+import uuid
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from hulio.core.interfaces.database import IDatabaseController, ComponentRecord, MessageRecord
+
+_MISSING = object()
+
+
+class StorageLookup(IDatabaseController):
+    """ Обёртка над хранилищем на время обработки одного update-а. Каждая
+        запись читается не более одного раза, а фильтры получают одни и те
+        же объекты. Обработчик компонента читает запись сам после захвата
+        блокировки, т.к. запомненная фильтром могла устареть. Запись проходит в хранилище сразу
+        и обновляет запомненные значения """
+
+    def __init__(self, storage: IDatabaseController):
+        self.storage = storage
+        self._components: dict[uuid.UUID, ComponentRecord] = {}
+        self._messages: dict[uuid.UUID, MessageRecord] = {}
+        self._focused: dict[tuple[int, int, int], t.Optional[ComponentRecord]] = {}
+
+    def setup(self):
+        self.storage.setup()
+
+    def component_track(self, record: ComponentRecord):
+        self.storage.component_track(record)
+        self._components[record.record_id] = record
+        self._focused.clear()
+
+    def component_untrack(self, record_id: uuid.UUID):
+        self.storage.component_untrack(record_id)
+        self._components.pop(record_id, None)
+        self._focused.clear()
+
+    def component_update(self, record: ComponentRecord):
+        self.storage.component_update(record)
+        self._components[record.record_id] = record
+        self._focused.clear()
+
+    def component_patch(self, record_id: uuid.UUID, values: dict[str, t.Any], state_patch: dict[str, t.Any] = None):
+        self.storage.component_patch(record_id, values, state_patch)
+        # Запись изменена частично, при следующем обращении читается заново
+        self._components.pop(record_id, None)
+        self._focused.clear()
+
+    def component_focus(self, bot_id: int, chat_id: int, user_id: int, record_id: t.Optional[uuid.UUID]):
+        self.storage.component_focus(bot_id, chat_id, user_id, record_id)
+        self._focused.pop((bot_id, chat_id, user_id), None)
+
+    def component_get_focused(self, bot_id: int, chat_id: int, user_id: int) -> t.Optional[ComponentRecord]:
+        key = bot_id, chat_id, user_id
+
+        focused = self._focused.get(key, _MISSING)
+        if focused is _MISSING:
+            focused = self._focused[key] = self.storage.component_get_focused(bot_id, chat_id, user_id)
+            if focused is not None:
+                self._components[focused.record_id] = focused
+
+        return focused
+
+    def component_get(self, record_id: uuid.UUID) -> t.Optional[ComponentRecord]:
+        try:
+            return self._components[record_id]
+        except KeyError:
+            record = self._components[record_id] = self.storage.component_get(record_id)
+            return record
+
+    def message_track(self, record: MessageRecord):
+        self.storage.message_track(record)
+        self._messages[record.record_id] = record
+        self._focused.clear()
+
+    def message_untrack(self, record_id: uuid.UUID):
+        self.storage.message_untrack(record_id)
+        self._messages.pop(record_id, None)
+        self._components = {
+            key: component
+            for key, component in self._components.items()
+            if component.message_record_id != record_id
+        }
+        self._focused.clear()
+
+    def message_get(self, record_id: uuid.UUID) -> MessageRecord:
+        try:
+            return self._messages[record_id]
+        except KeyError:
+            record = self._messages[record_id] = self.storage.message_get(record_id)
+            return record
+
+
+class StorageLookupMiddleware(BaseMiddleware):
+    """ Создаёт StorageLookup на каждый update. Должен быть установлен как
+        outer-middleware, чтобы фильтры тоже его получали """
+
+    def __init__(self, storage: IDatabaseController):
+        self.storage = storage
+
+    async def __call__(
+            self,
+            handler: t.Callable[[TelegramObject, dict[str, t.Any]], t.Awaitable[t.Any]],
+            event: TelegramObject,
+            data: dict[str, t.Any]
+    ) -> t.Any:
+        data['storage_lookup'] = StorageLookup(self.storage)
+        return await handler(event, data)
+
+
+__all__ = (
+    'StorageLookup',
+    'StorageLookupMiddleware',
+)
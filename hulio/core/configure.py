@@ -2,31 +2,42 @@ import typing as t
 
 import aiogram
 
+import template
 from hulio.core import glob
 from hulio.core.attribute import get_attribute
+from hulio.core.classes.callback_codec import CallbackCodec
+from hulio.core.classes.component import Component, PAGINATE_ACTION
+from hulio.core.classes.component_cache import ComponentCache
 from hulio.core.classes.component_registry import ComponentRegistry
 from hulio.core.classes.database_controller import DatabaseController
+from hulio.core.classes.lock_manager import LockManager
+from hulio.core.classes.state_codec import StateCodec
+from hulio.core.classes.storage_lookup import StorageLookupMiddleware
 from hulio.core.decorators import TextInfo, ButtonInfo
-from hulio.core.filters.is_component_button import is_component_button
 from hulio.core.filters.is_component_focused import is_component_focused
+from hulio.core.handlers.callback_dispatcher import CallbackDispatcher
 from hulio.core.handlers.component_handler_decorator import component_handler_decorator
-from hulio.core.interfaces.database import IDatabaseController, IDatabaseProvider
-
-if t.TYPE_CHECKING:
-    from hulio.core.classes.component import Component
+from hulio.core.interfaces.database import IDatabaseProvider
 
 
 def _register_components_handlers(
         component: type[Component],
         router: aiogram.Router,
-        storage: IDatabaseController,
+        storage: ComponentCache,
         registry: ComponentRegistry,
-        prefix: str,
-        separator: str
+        dispatcher: CallbackDispatcher,
+        locks: LockManager
 ):
     """ Регистрирует  """
     component_id = component.get_component_id()
 
+    # Встроенное действие навигации по страницам <paged-keyboard>
+    registry.register_action(component_id, PAGINATE_ACTION)
+    dispatcher.add(
+        component_id, PAGINATE_ACTION,
+        component_handler_decorator(component.__paginate__, component_id, storage, registry, locks)
+    )
+
     for handler in component.__dict__.values():
         if not callable(handler):
             continue
@@ -41,7 +52,7 @@ def _register_components_handlers(
             # Если всё прошло успешно, `component_handler_decorator` создаёт
             # объект компонента по данным из базы и вызывает на нём обработчик
             router.message.register(
-                component_handler_decorator(handler, storage, registry),
+                component_handler_decorator(handler, component_id, storage, registry, locks),
                 is_component_focused(component_id, storage),
                 *action.filters
             )
@@ -49,10 +60,15 @@ def _register_components_handlers(
             continue
 
         if isinstance(action, ButtonInfo):
-            router.callback_query.register(
-                component_handler_decorator(handler, storage, registry),
-                is_component_button(component_id, action.callback_data_alias, storage, prefix, separator),
-                *action.filters
+            # В callback_data действие хранится номером из реестра
+            registry.register_action(component_id, action.callback_data_alias)
+
+            # Кнопки всех компонентов обрабатываются одним обработчиком,
+            # см. `CallbackDispatcher`
+            dispatcher.add(
+                component_id, action.callback_data_alias,
+                component_handler_decorator(handler, component_id, storage, registry, locks),
+                action.filters
             )
 
             continue
@@ -62,11 +78,16 @@ def configure(
         *,
         aiogram_callback_prefix: str = None,  # 'h' by default
         aiogram_callback_separator: str = None,  # ':' by default
+        aiogram_callback_spill_size: int = None,  # Max number of oversized button args kept in memory, 10000 by default
         aiogram_bots: t.Iterable[aiogram.Bot],
         aiogram_router: aiogram.Router,
         storage_provider: IDatabaseProvider = None,
-        components: t.Iterable[type[Component]]
+        components: t.Iterable[type[Component]],
+        warm_up_templates: bool = False,  # Parse all component templates before handling updates
+        component_cache_size: int = 1024,  # Max number of live component objects kept between updates
+        state_codec: StateCodec = None  # Format of stored component state, JsonStateCodec by default
 ):
+    components = list(components)
 
     # Filling up bot map
     glob.bot_map = {}
@@ -74,7 +95,7 @@ def configure(
         glob.bot_map[bot.id] = bot
 
     # Setting up storage
-    glob.storage = DatabaseController(storage_provider)
+    glob.storage = ComponentCache(DatabaseController(storage_provider), component_cache_size, state_codec)
 
     # Setting up components
     for component in components:
@@ -87,19 +108,42 @@ def configure(
     if aiogram_callback_separator is not None:
         glob.aiogram_callback_separator = aiogram_callback_separator
 
+    if aiogram_callback_spill_size is not None:
+        glob.aiogram_callback_spill_size = aiogram_callback_spill_size
+
+    glob.callback_codec = CallbackCodec(
+        glob.global_component_registry,
+        glob.aiogram_callback_prefix,
+        glob.aiogram_callback_separator,
+        glob.aiogram_callback_spill_size
+    )
+
+    # Parsing templates ahead of time, so first render doesn't happen
+    # during user traffic. Syntax errors are raised right here
+    if warm_up_templates:
+        template.warm_up(component.get_template() for component in components)
+
     # Setting up router
     glob.router = aiogram_router
 
+    # Чтения хранилища запоминаются на время обработки update-а
+    glob.router.message.outer_middleware(StorageLookupMiddleware(glob.storage))
+    glob.router.callback_query.outer_middleware(StorageLookupMiddleware(glob.storage))
+    glob.callback_dispatcher = CallbackDispatcher(glob.callback_codec, glob.storage)
+    glob.lock_manager = LockManager()
+
     for component in components:
         _register_components_handlers(
             component,
             glob.router,
             glob.storage,
             glob.global_component_registry,
-            glob.aiogram_callback_prefix,
-            glob.aiogram_callback_separator
+            glob.callback_dispatcher,
+            glob.lock_manager
         )
 
+    glob.router.callback_query.register(glob.callback_dispatcher.handle, glob.callback_dispatcher.filter)
+
     # if glob.storage is not None:
     #     glob.router.message.register(
     #         ...,
@@ -1,20 +1,24 @@
 from aiogram.types import Message
 
+from hulio.core.classes.storage_lookup import StorageLookup
 from hulio.core.interfaces.database import IDatabaseController
 
 
 def is_component_focused(component_id: str, storage: IDatabaseController):
-    async def _filter(message: Message):
+    async def _filter(message: Message, storage_lookup: StorageLookup = None):
         if message.bot is None:
             return False
 
-        focused = storage.component_get_focused(message.bot.id, message.chat.id, message.from_user.id)
+        # Фильтры всех @text обработчиков разделяют одно чтение за update
+        focused = (storage_lookup or storage).component_get_focused(
+            message.bot.id, message.chat.id, message.from_user.id
+        )
 
         if focused is None or focused.component_id != component_id:
             return False
 
         return {
-            'component_record_id': focused.component_record_id
+            'component_record_id': focused.record_id
         }
 
     return _filter
@@ -2,15 +2,25 @@ import typing as t
 
 import aiogram
 
+from hulio.core.classes.callback_codec import CallbackCodec
+from hulio.core.classes.component_cache import ComponentCache
 from hulio.core.classes.component_registry import ComponentRegistry
-from hulio.core.interfaces.database import IDatabaseController
+from hulio.core.classes.lock_manager import LockManager
+from hulio.core.handlers.callback_dispatcher import CallbackDispatcher
 
 aiogram_callback_prefix: str = 'h'
 aiogram_callback_separator: str = ':'
+aiogram_callback_spill_size: int = 10_000
 
-storage: t.Optional[IDatabaseController] = None
+callback_codec: t.Optional[CallbackCodec] = None
+callback_dispatcher: t.Optional[CallbackDispatcher] = None
+
+storage: t.Optional[ComponentCache] = None
 router: t.Optional[aiogram.Router] = None
 
+# Обработчики одного компонента выполняются по очереди
+lock_manager: t.Optional[LockManager] = None
+
 global_component_registry = ComponentRegistry(
     debug_name='Global Component Registry'
 )
@@ -0,0 +1,72 @@
+import typing as t
+
+from aiogram.dispatcher.event.handler import FilterObject
+from aiogram.types import CallbackQuery
+
+from hulio.core.classes.callback_codec import CallbackCodec
+from hulio.core.interfaces.database import IDatabaseController
+
+
+class CallbackDispatcher:
+    """ Единый обработчик нажатий на кнопки компонентов. callback_data
+        декодируется один раз, после чего обработчик находится по
+        (component_id, action_id), поэтому стоимость не зависит от
+        количества компонентов. Кнопки компонентов, которые больше
+        не отслеживаются, и поддельные record_id отбрасываются """
+
+    def __init__(self, codec: CallbackCodec, storage: IDatabaseController):
+        self._codec = codec
+        self._storage = storage
+        self._handlers: dict[tuple[str, str], tuple[t.Callable, tuple[FilterObject, ...]]] = {}
+
+    def add(self, component_id: str, action_id: str, handler: t.Callable, filters: t.Iterable[t.Callable] = ()):
+        """ Регистрирует обработчик действия компонента и пользовательские фильтры к нему """
+        key = component_id, action_id
+        if key in self._handlers:
+            raise ValueError(f'Action "{action_id}" of component "{component_id}" already has a handler')
+
+        self._handlers[key] = handler, tuple(map(FilterObject, filters))
+
+    async def filter(self, query: CallbackQuery, **kwargs) -> t.Union[bool, dict[str, t.Any]]:
+        data = self._codec.decode(query.data)
+        if data is None:
+            return False
+
+        try:
+            handler, filters = self._handlers[data.component_id, data.action_id]
+        except KeyError:
+            return False
+
+        # Запись, прочитанная здесь, запоминается на время update-а
+        storage = kwargs.get('storage_lookup') or self._storage
+        record = storage.component_get(data.record_id)
+        if record is None or record.component_id != data.component_id:
+            return False
+
+        result = {
+            'component_record_id': data.record_id,
+            'args': list(data.args),
+            'component_handler': handler
+        }
+
+        # Пользовательские фильтры проверяются только для найденного действия
+        #   и получают данные предыдущих фильтров, как и в aiogram
+        filter_data = {**kwargs, **result}
+        for _filter in filters:
+            check = await _filter.call(query, **filter_data)
+            if not check:
+                return False
+            if isinstance(check, dict):
+                filter_data.update(check)
+                result.update(check)
+
+        return result
+
+    @staticmethod
+    async def handle(query: CallbackQuery, component_handler: t.Callable, **kwargs):
+        return await component_handler(query, **kwargs)
+
+
+__all__ = (
+    'CallbackDispatcher',
+)
@@ -2,13 +2,15 @@ import typing as t
 import uuid
 
 from aiogram import Bot
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery, Chat
 
 from hulio.core.classes.callable_object import CallableObject
+from hulio.core.classes.component_cache import ComponentCache
 from hulio.core.classes.component import Component
 from hulio.core.classes.component_registry import ComponentRegistry
+from hulio.core.classes.lock_manager import LockManager
 from hulio.core.contexts import current_component, current_bot, current_chat
-from hulio.core.interfaces.database import IDatabaseController, ComponentRecord
+from hulio.core.interfaces.database import ComponentRecord
 
 
 def _find_bot(bot_id: int, bots: tuple[Bot]) -> t.Optional[Bot]:
@@ -22,30 +24,82 @@ def _find_bot(bot_id: int, bots: tuple[Bot]) -> t.Optional[Bot]:
         return None
 
 
-async def component_handler_decorator(handler: t.Callable, storage: IDatabaseController, registry: ComponentRegistry):
+def _find_chat(event: t.Union[Message, CallbackQuery], kwargs: dict[str, t.Any]) -> t.Optional[Chat]:
+    """ Чат события. aiogram передаёт его в event_chat, у CallbackQuery
+        собственного чата нет, он берётся из сообщения с кнопкой """
+    chat = kwargs.get('event_chat')
+    if chat is not None:
+        return chat
+    if isinstance(event, CallbackQuery):
+        return event.message.chat if event.message is not None else None
+    return event.chat
+
+
+def component_handler_decorator(
+        handler: t.Callable,
+        component_id: str,
+        storage: ComponentCache,
+        registry: ComponentRegistry,
+        locks: LockManager
+):
     """ Декоратор над обработчиком события в компоненте.
         Handler - должен быть методом компонента.
-        Ожидает получить component_record_id из фильтров """
+        Ожидает получить component_record_id из фильтров. Если компонента
+        с таким record_id и component_id нет, событие игнорируется.
+        Обработчики одного компонента выполняются по очереди, после
+        обработчика состояние компонента записывается в хранилище """
 
     handler = CallableObject(handler)
 
     async def _handler(message: Message, component_record_id: uuid.UUID, **kwargs):
-        component_info: ComponentRecord = storage.component_get(component_record_id)
-        component_class: type[Component] = registry.get(component_info.component_id)
-        component = component_class.model_validate_json(component_info.state_json)
+        async with locks.lock(component_record_id):
+            await _handle(message, component_record_id, **kwargs)
+
+    async def _handle(message: Message, component_record_id: uuid.UUID, **kwargs):
+        # Изменения записываются и через StorageLookup update-а, чтобы он не
+        # вернул устаревшую запись
+        lookup = kwargs.get('storage_lookup') or storage
+
+        # Недавно использованные компоненты не разбираются заново
+        component = storage.get(component_record_id)
+        if component is None:
+            # Запись читается из хранилища, а не из StorageLookup: прочитанная
+            # фильтром до захвата блокировки могла устареть
+            component_info: t.Optional[ComponentRecord] = storage.component_get(component_record_id)
+
+            # Устаревшие или поддельные данные кнопки
+            if component_info is None or component_info.component_id != component_id:
+                return
+
+            component_class: type[Component] = registry.get(component_info.component_id)
+            component = storage.load(component_info, component_class)
+
+        elif component.get_component_id() != component_id:
+            return
 
         bot = _find_bot(component.bot_id, kwargs['bots'])
 
         _current_component = current_component.set(component)
         _current_bot = current_bot.set(bot)
-        _current_chat = current_chat.set(message.chat)
+        _current_chat = current_chat.set(_find_chat(message, kwargs))
 
         # Handler - это всегда метод одного из потомков класса Component
         #   поэтому передаём ему component в качестве self
-        await handler.call(component, message=message, **kwargs)
+        try:
+            await handler.call(component, message=message, **kwargs)
+        except BaseException:
+            # Объект мог быть изменён частично, следующий обработчик
+            # должен начать с последнего записанного состояния
+            storage.invalidate(component_record_id)
+            raise
+        finally:
+            current_component.reset(_current_component)
+            current_bot.reset(_current_bot)
+            current_chat.reset(_current_chat)
 
-        current_component.reset(_current_component)
-        current_bot.reset(_current_bot)
-        current_chat.reset(_current_chat)
+        # Объект в кеше уже изменён, поэтому состояние сразу записывается,
+        # если компонент всё ещё отслеживается
+        if component.is_tracked:
+            storage.save(component, lookup)
 
     return _handler
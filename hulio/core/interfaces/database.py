@@ -10,7 +10,7 @@ class ComponentRecord(BaseModel):
     parent_record_id: t.Optional[uuid.UUID]
     message_record_id: uuid.UUID
     component_id: str
-    state_json: str
+    state_json: t.Union[str, bytes]  # Формат зависит от StateCodec, см. ComponentCache
     is_enabled: bool
 
 
@@ -29,7 +29,8 @@ class MessageRecord(BaseModel):
         'a',  # Animation
         'v',  # Video
         'd',  # Document
-        'au'  # Audio
+        'au',  # Audio
+        'al'  # Album
     ]
 
 
@@ -46,10 +47,16 @@ class IDatabaseController(t.Protocol):
     def component_update(self, record: ComponentRecord):
         raise NotImplementedError
 
-    def component_get_focused(self, bot_id: int, chat_id: int, user_id: int) -> ComponentRecord:
+    def component_patch(self, record_id: uuid.UUID, values: dict[str, t.Any], state_patch: dict[str, t.Any] = None):
         raise NotImplementedError
 
-    def component_get(self, record_id: uuid.UUID) -> ComponentRecord:
+    def component_focus(self, bot_id: int, chat_id: int, user_id: int, record_id: t.Optional[uuid.UUID]):
+        raise NotImplementedError
+
+    def component_get_focused(self, bot_id: int, chat_id: int, user_id: int) -> t.Optional[ComponentRecord]:
+        raise NotImplementedError
+
+    def component_get(self, record_id: uuid.UUID) -> t.Optional[ComponentRecord]:
         raise NotImplementedError
 
     def message_track(self, record: MessageRecord):
@@ -84,5 +91,13 @@ class IDatabaseProvider(t.Protocol):
     def update(self, schema_name: str, table_name: str, values: dict[str, t.Any], record_id: uuid.UUID):
         raise NotImplementedError
 
+    def patch_json(self, schema_name: str, table_name: str, column: str, patch: dict[str, t.Any],
+                   record_id: uuid.UUID):
+        """ Необязательно. Обновляет ключи верхнего уровня json-объекта в колонке
+            без перезаписи остальных, например, через `jsonb || patch` в
+            PostgreSQL. Провайдеры, не поддерживающие это, оставляют
+            NotImplementedError """
+        raise NotImplementedError
+
     def delete(self, schema_name: str, table_name: str, record_id: uuid.UUID):
         raise NotImplementedError
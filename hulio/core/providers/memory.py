@@ -1,3 +1,4 @@
+import json
 import uuid
 import typing as t
 from datetime import datetime
@@ -80,6 +81,16 @@ class MemoryStorageProvider(IDatabaseProvider):
         for col, val in values.items():
             table[record_id][table_columns.index(col)] = val
 
+    def patch_json(self, schema_name: str, table_name: str, column: str, patch: dict[str, t.Any],
+                   record_id: uuid.UUID):
+        """ Хранилище в памяти держит json текстом, поэтому значение
+            перечитывается и записывается целиком. Экономию даёт только
+            провайдер, объединяющий json на стороне базы """
+        table, table_columns = self._database[schema_name][table_name]
+        row = table[record_id]
+        index = table_columns.index(column)
+        row[index] = json.dumps({**json.loads(row[index]), **patch})
+
     def delete(self, schema_name: str, table_name: str, record_id: uuid.UUID):
         table, _ = self._database[schema_name][table_name]
         del table[record_id]
@@ -36,7 +36,6 @@ import contextvars
 import dataclasses
 import inspect
 import uuid
-from asyncio import Lock
 from functools import partial
 from typing import Optional, ClassVar, Callable, Hashable, Union, Literal, Any
 
@@ -46,6 +45,8 @@ from aiogram.types import Message, CallbackQuery, ReplyParameters
 from pydantic import BaseModel, Field, ConfigDict
 
 import classes.message_editor as me
+from classes.refresh_coalescer import get_refresh_coalescer
+from hulio.core.classes.lock_manager import LockManager
 from template import render, set_default_syntax
 from template_for_aiogram import aiogram_syntax
 
@@ -58,28 +59,20 @@ me.bot = bot
 dp = Dispatcher()
 
 
+_lock_manager = LockManager()
+
+
 class KeyLock:
-    _locks: dict[Hashable, Lock] = {}
+    """ Блокировка по ключу, см. LockManager """
 
     def __init__(self, key: Hashable):
         self._key = key
 
     async def __aenter__(self):
-        if self._key in self._locks:
-            lock = self._locks[self._key]
-            await lock.acquire()
-            self._locks[self._key] = lock
-            print(f'Lock {self._key} acquired')
-        else:
-            self._locks[self._key] = lock = Lock()
-            await lock.acquire()
-            print(f'Lock {self._key} created and acquired')
+        await _lock_manager.acquire(self._key)
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        lock = self._locks[self._key]
-        del self._locks[self._key]
-        lock.release()
-        print(f'Lock {self._key} released')
+        _lock_manager.release(self._key)
 
 
 @dataclasses.dataclass
@@ -364,17 +357,57 @@ class MessageView(BaseModel):
 
     async def delete(self):
         """ Deletes message and stops tracking view """
+        get_refresh_coalescer().discard(self.__refresh_key())
         await self.message.delete()
 
         database.delete(self.record_id)
         self.record_id = None
 
     async def refresh(self):
+        """ Requests message edit. The edit starts right away; refreshes of the
+            same message requested while it is in progress are merged into one
+            following edit with the latest state. Returns before the edit is
+            done, failed edits are logged by the coalescer """
+        get_refresh_coalescer().request(self.__refresh_key(), self.__edit)
+
+    def __refresh_key(self) -> Hashable:
+        return self.record_id if self.record_id is not None else id(self.message)
+
+    async def __edit(self):
+        if self.record_id is not None:
+            # The message may have been edited after this view was loaded (a
+            #   previous refresh of this message was in flight), so the editor
+            #   is taken from the stored state: its fingerprint and media ids
+            #   must match what is actually shown
+            async with KeyLock(self.record_id):
+                try:
+                    _, data = database.get(self.record_id)
+                except KeyError:
+                    return  # View was deleted meanwhile
+
+            self.message = type(self).model_validate_json(data).message
+
         blueprint = self.__render__()
         await self.message.edit(
             message=blueprint
         )
 
+        if self.record_id is None:
+            return
+
+        # Edit updates message state (media ids etc.), which has to be saved.
+        #   The view itself may have been changed by other handlers meanwhile,
+        #   so only the message is written into the latest stored state
+        async with KeyLock(self.record_id):
+            try:
+                _, data = database.get(self.record_id)
+            except KeyError:
+                return  # View was deleted while editing
+
+            stored = type(self).model_validate_json(data)
+            stored.message = self.message
+            database.update(self.record_id, stored.model_dump_json())
+
     def focus(self):
         database.set_focus(self.bot_id, self.chat_id, self.record_id)
 
@@ -14,11 +14,23 @@ from ._template import (
     ParsingCoroutineError,
     SpecifierError,
     ConvertingError,
+    BudgetExceededError,
+
+    RenderLimits,
+    metrics,
 
     get_default_syntax,
     set_default_syntax,
     get_global_context,
     set_global_context,
+    get_render_limits,
+    set_render_limits,
+    get_catalog,
+    set_catalog,
+    load_document,
+    clear_document_cache,
+    find_static_values,
+    warm_up,
     render_string,
     render,
 )
@@ -1,12 +1,23 @@
+import collections
+import contextlib
 import dataclasses
 import functools
+import importlib
+import logging
+import os
+import time
+import tracemalloc
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Callable, Generator, Optional, Type, Any, Union, Iterable, Generic, TypeVar
+from typing import Callable, Generator, Optional, Type, Any, Union, Iterable, Generic, TypeVar, ClassVar
 from xml.dom import minidom
 from xml.dom.minidom import Element, Document
+from xml.parsers.expat import ExpatError
 
 T = TypeVar('T')
 
+logger = logging.getLogger(__name__)
+
 
 class ReadOnlyDict(dict):
     def __readonly__(self, *args, **kwargs):
@@ -65,6 +76,88 @@ class ConvertingError(SpecifierError):
     pass
 
 
+class BudgetExceededError(ParsingError):
+    def __init__(self, budget: str, message: str):
+        super().__init__(message)
+        self.budget = budget
+
+
+metrics = collections.Counter()
+""" Счётчики модуля, например "budget_exceeded.iterations" """
+
+
+@dataclasses.dataclass
+class RenderLimits:
+    """ Ограничения одного render-а. None - ограничение не применяется """
+
+    max_iterations: Optional[int] = 10_000
+    """ Максимальное количество итераций одного "for" """
+    max_include_depth: Optional[int] = 32
+    """ Максимальная глубина вложенности подключаемых шаблонов """
+    max_tokens: Optional[int] = 100_000
+    """ Максимальное количество токенов, переданных parser-ам """
+    max_time: Optional[float] = 1.0
+    """ Максимальное время render-а в секундах """
+
+
+class RenderState:
+    """ Состояние текущего render-а, общее для всех вложенных областей """
+
+    __slots__ = ('limits', 'locale', 'tokens', 'include_depth', 'deadline')
+
+    def __init__(self, limits: RenderLimits, locale: str = None):
+        self.limits = limits
+        self.locale = locale
+        self.tokens = 0
+        self.include_depth = 0
+        self.deadline = (
+            None if limits.max_time is None
+            else time.monotonic() + limits.max_time
+        )
+
+    @staticmethod
+    def exceeded(budget: str, message: str):
+        metrics[f'budget_exceeded.{budget}'] += 1
+        raise BudgetExceededError(budget, message)
+
+    def check_time(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.exceeded('time', f'Render took more than {self.limits.max_time}s')
+
+    def count_token(self):
+        self.tokens += 1
+        if self.limits.max_tokens is not None and self.tokens > self.limits.max_tokens:
+            self.exceeded('tokens', f'Render produced more than {self.limits.max_tokens} tokens')
+        self.check_time()
+
+    def count_iteration(self, iteration: int):
+        if self.limits.max_iterations is not None and iteration >= self.limits.max_iterations:
+            self.exceeded('iterations', f'Loop made more than {self.limits.max_iterations} iterations')
+        self.check_time()
+
+
+_render_limits = RenderLimits()
+_render_state: ContextVar[RenderState] = ContextVar('render_state')
+
+
+def lazy_import(path: str) -> Any:
+    """
+    Импортирует модуль ("module") или объект из него ("module:Name").
+    Время импорта во время render-а не учитывается в его ограничении
+    по времени, т.к. импорт выполняется один раз за процесс
+    """
+    module, _, name = path.partition(':')
+
+    started = time.monotonic()
+    result = importlib.import_module(module)
+
+    state = _render_state.get(None)
+    if state is not None and state.deadline is not None:
+        state.deadline += time.monotonic() - started
+
+    return getattr(result, name) if name else result
+
+
 class ConvertBy:
     class _Convert:
         __slots__ = ('convert',)
@@ -217,7 +310,13 @@ def exec_python_specifier(value, context, target_type) -> Any:
     :param target_type: Тип, который будет передан в код.
     :return: Значение переменной с указанным именем в контексте.
     """
-    return eval(value, {}, {**context, '__target__': target_type, '__context__': context})
+    return eval(_compile_python(value), {}, {**context, '__target__': target_type, '__context__': context})
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_python(value: str):
+    """ Компилирует выражение один раз, а не при каждом вычислении """
+    return compile(value.strip(), '<template>', 'eval')
 
 
 converters = {
@@ -238,6 +337,93 @@ StopParsing = object()
 """ Объект, используемый для указания parser-у о завершении обработки """
 
 
+def accepts(*types: Union[type, str]) -> Callable:
+    """
+    Помечает метод Assembler-а как принимающий токены указанных типов.
+    Токены подтипов будут переданы тому же методу, если для них не
+    объявлен отдельный.
+
+    Тип можно указать строкой вида "module:Name", тогда модуль будет
+    импортирован только при получении токена необъявленного типа. К этому
+    моменту модуль, создавший токен, уже загружен, поэтому импорт дешёвый::
+
+        @accepts('aiogram.types:InlineKeyboardMarkup')
+        def add_keyboard(self, token):
+            ...
+
+    """
+    def decorator(func):
+        func.__accepts__ = types
+        return func
+    return decorator
+
+
+class Assembler:
+    """
+    Сборщик токенов - альтернатива parser-генераторам. Вместо передачи
+    каждого токена через generator.send, токен передаётся напрямую методу,
+    объявленному для его типа с помощью `accepts`.
+
+    Например::
+
+        class Example(Assembler):
+            def __init__(self):
+                self.message = 'Life is going on'
+
+            @accepts(str)
+            def add_text(self, token: str):
+                self.message += token
+
+            def result(self) -> str:
+                return self.message
+
+        EXAMPLE = ParsingScope(Example)
+
+    Обработчики тегов при этом остаются прежними.
+    """
+
+    __dispatch__: ClassVar[dict[type, Callable]] = {}
+    __lazy__: ClassVar[dict[str, Callable]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        dispatch = {}
+        for base in reversed(cls.__mro__[1:]):
+            dispatch.update(getattr(base, '__declared__', {}))
+
+        for attribute in cls.__dict__.values():
+            for tp in getattr(attribute, '__accepts__', ()):
+                dispatch[tp] = attribute
+
+        cls.__declared__ = dispatch.copy()
+        cls.__dispatch__ = {tp: method for tp, method in dispatch.items() if not isinstance(tp, str)}
+        cls.__lazy__ = {tp: method for tp, method in dispatch.items() if isinstance(tp, str)}
+
+    @classmethod
+    def resolve(cls, token: Any) -> Callable:
+        """ Находит метод для типа токена, не объявленного явно,
+            и запоминает результат """
+        # Типы, указанные строками, импортируются один раз
+        while cls.__lazy__:
+            path, method = cls.__lazy__.popitem()
+            cls.__dispatch__.setdefault(lazy_import(path), method)
+
+        for tp in type(token).__mro__:
+            try:
+                method = cls.__dispatch__[tp]
+            except KeyError:
+                continue
+            cls.__dispatch__[type(token)] = method
+            return method
+
+        raise ParsingCoroutineError(f'Got unexpected token "{token}" (type: {token.__class__})')
+
+    def result(self) -> Any:
+        """ Вызывается после обработки всех токенов, возвращает результат parsing-а """
+        raise NotImplementedError
+
+
 class ParsingScope:
     DISPLAY_ATTRIBUTE_IF = 'if'
     DISPLAY_ATTRIBUTE_ELSE_IF = 'else-if'
@@ -257,89 +443,134 @@ class ParsingScope:
         annotations: dict[str, Type]
         defaults: dict[str, Any]
         takes_remaining: bool
+        annotated: frozenset[str] = dataclasses.field(init=False)
+        mandatory: frozenset[str] = dataclasses.field(init=False)
+
+        def __post_init__(self):
+            self.annotated = frozenset(self.annotations)
+            self.mandatory = self.annotated - set(self.defaults)
+
+    class ElementInfo:
+        """ Разобранные атрибуты элемента. Вычисляются один раз при первом
+            посещении элемента и сохраняются в нём, чтобы не копировать
+            атрибуты при каждом render-е """
+
+        __slots__ = ('conditions', 'loop', 'arguments', 'provided', 'static', 'memo')
+
+        def __init__(self, element: Element):
+            self.conditions: dict[str, str] = {}
+            self.loop: Optional[str] = None
+            self.arguments: dict[str, tuple[str, str]] = {}
+            self.static: Optional[bool] = None
+            self.memo: Optional[dict[Callable, Any]] = None
+
+            for attribute, value in element.attributes.items():
+                if attribute in (ParsingScope.DISPLAY_ATTRIBUTE_IF, ParsingScope.DISPLAY_ATTRIBUTE_ELSE_IF,
+                                 ParsingScope.DISPLAY_ATTRIBUTE_ELSE):
+                    self.conditions[attribute] = value
+                    continue
+
+                if attribute == ParsingScope.DUPLICATE_ATTRIBUTE:
+                    self.loop = value
+                    continue
+
+                # Отделение спецификаторов от имён аргументов
+                try:
+                    attribute, spec = attribute.split('.', maxsplit=1)
+                except ValueError:
+                    spec = ''
 
-    def __init__(self, parsing_function: Callable[[], Generator]):
+                self.arguments[attribute] = value, spec
+
+            self.provided = frozenset(self.arguments)
+
+        @classmethod
+        def of(cls, element: Element) -> 'ParsingScope.ElementInfo':
+            try:
+                return element.__template_info__
+            except AttributeError:
+                info = element.__template_info__ = cls(element)
+                return info
+
+        def is_static(self, element: Element) -> bool:
+            """ Элемент статичен, если ни он, ни его потомки не зависят от контекста """
+            if self.static is not None:
+                return self.static
+
+            self.static = not self.conditions and self.loop is None and all(
+                spec == 'nf' or (spec == '' and '{' not in value and '}' not in value)
+                for value, spec in self.arguments.values()
+            ) and all(
+                ('{' not in node.data and '}' not in node.data) if node.nodeType == Element.TEXT_NODE
+                else self.of(node).is_static(node) if node.nodeType == Element.ELEMENT_NODE
+                else True
+                for node in element.childNodes
+            )
+
+            return self.static
+
+    def __init__(self, parsing_function: Union[Callable[[], Generator], Type[Assembler]]):
         self.parsing_function = parsing_function
+        self.is_assembler = isinstance(parsing_function, type) and issubclass(parsing_function, Assembler)
         self.text_handler: Optional[Callable] = None
         self.handlers: dict[str, ParsingScope.Handler] = {}
 
+        # Модули, регистрирующие обработчики при импорте (см. `register_lazy`)
+        self.lazy_text_handler: Optional[str] = None
+        self.lazy_handlers: dict[str, str] = {}
+
     # Parsing -------------------------------------------------------
 
-    def __arguments__(
-            self,
-            annotations: dict[str, Type],
-            defaults: dict[str, Any],
-            takes_remaining: bool,
-            attributes: dict[str, str],
-            context: ReadOnlyDict
-    ) -> dict[str, Any]:
-        """ По переданным аттрибутам тега и ожидаемым аргументам собирает
+    def __arguments__(self, handler: Handler, info: ElementInfo, context: ReadOnlyDict) -> dict[str, Any]:
+        """ По разобранным аттрибутам тега и ожидаемым аргументам собирает
             значения для передачи в обработчик """
 
-        # Отделение спецификаторов от имён аргументов
-        arguments = {}
-        for attribute, value in attributes.items():
-            try:
-                attribute, spec = attribute.split('.', maxsplit=1)
-            except ValueError:
-                spec = ''
+        # Проверка соответствия между переданными аргументами и ожидаемыми
+        if unprovided := handler.mandatory - info.provided:
+            raise ParsingError(f'Arguments {set(unprovided)} were expected, but not provided')
+        if not handler.takes_remaining and (unexpected := info.provided - handler.annotated):
+            raise ParsingError(f'Got unexpected arguments {set(unexpected)}')
 
+        # Формирование аргументов
+        args = {}
+        remaining = {}
+        for arg, (value, spec) in info.arguments.items():
             try:
-                converter = specifiers[spec]
+                convert = specifiers[spec]
             except KeyError:
                 raise ParsingError(f'No such specifier as "{spec}" is registered')
 
-            arguments[attribute] = value, converter
-
-        # Проверка соответствия между переданными аргументами и ожидаемыми
-        provided = set(arguments)
-        annotated = set(annotations)
-        mandatory = annotated - set(defaults)
-
-        if unprovided := mandatory - provided:
-            raise ParsingError(f'Arguments {unprovided} were expected, but not provided')
-        if not takes_remaining and (unexpected := provided - annotated):
-            raise ParsingError(f'Got unexpected arguments {unexpected}')
-
-        # Формирование аргументов
-        args = {}
-        for arg in provided.intersection(annotated):
-            value, convert = arguments[arg]
-            args[arg] = convert(value, context, annotations[arg])
-        for arg in annotated - provided:
-            args[arg] = defaults[arg]
+            try:
+                target_type = handler.annotations[arg]
+            except KeyError:
+                remaining[arg] = convert(value, context, str)
+                continue
 
-        if not takes_remaining:
-            return args
+            args[arg] = convert(value, context, target_type)
 
-        remaining = {}
-        for arg in provided - annotated:
-            value, convert = arguments[arg]
-            remaining[arg] = convert(value, context, str)
+        for arg in handler.annotated - info.provided:
+            args[arg] = handler.defaults[arg]
 
-        args[self.REMAINING_ARGUMENT] = remaining
+        if handler.takes_remaining:
+            args[self.REMAINING_ARGUMENT] = remaining
 
         return args
 
-    def __display__(self, attributes: dict[str, str], context: ReadOnlyDict,
+    def __display__(self, info: ElementInfo, context: ReadOnlyDict,
                     cond_status: MutableVariable[Optional[bool]]) -> bool:
         """ Вызывается на каждом элементе, чтобы определить должен
             ли он быть отображён """
-        cond_attr_present = (
-            (self.DISPLAY_ATTRIBUTE_IF in attributes)
-            + (self.DISPLAY_ATTRIBUTE_ELSE_IF in attributes)
-            + (self.DISPLAY_ATTRIBUTE_ELSE in attributes)
-        )
-
-        if cond_attr_present > 1:
-            raise ParsingError('There must be only one of "if", "else-if" or "else" in a single tag')
+        conditions = info.conditions
 
-        if cond_attr_present == 0:
+        if not conditions:
             return True
 
+        if len(conditions) > 1:
+            raise ParsingError('There must be only one of "if", "else-if" or "else" in a single tag')
+
         # "if" attribute
 
-        cond = attributes.pop(self.DISPLAY_ATTRIBUTE_IF, None)
+        cond = conditions.get(self.DISPLAY_ATTRIBUTE_IF)
 
         if cond is not None:
             cond_status.value = bool(exec_python_specifier(cond, context, bool))
@@ -347,7 +578,7 @@ class ParsingScope:
 
         # "else-if" attribute
 
-        cond = attributes.pop(self.DISPLAY_ATTRIBUTE_ELSE_IF, None)
+        cond = conditions.get(self.DISPLAY_ATTRIBUTE_ELSE_IF)
 
         if cond is not None:
             if cond_status.value is None:
@@ -361,7 +592,7 @@ class ParsingScope:
 
         # "else" attribute
 
-        cond = attributes.pop(self.DISPLAY_ATTRIBUTE_ELSE, None)
+        cond = conditions.get(self.DISPLAY_ATTRIBUTE_ELSE)
 
         if cond is not None:
             if cond_status.value is None:
@@ -378,38 +609,61 @@ class ParsingScope:
         # Should be unreachable, unless there is an error in this code
         raise
 
-    def __duplicate__(self, attributes: dict[str, str], context: ReadOnlyDict) -> Iterable[ReadOnlyDict]:
+    def __duplicate__(self, info: ElementInfo, context: ReadOnlyDict) -> Iterable[ReadOnlyDict]:
         """ Вызывается на каждом элементе, чтобы определить сколько
             раз он должен быть отображён """
-        try:
-            value = attributes.pop(self.DUPLICATE_ATTRIBUTE)
-        except KeyError:
+        if info.loop is None:
             # Таким образом при отсутствии необходимости в
             # дублировании элемента контекст не копируется
             yield context
             return
 
         try:
-            cvs, source_cv = value.split(self.DUPLICATE_SEPARATOR, maxsplit=1)
+            cvs, source_cv = info.loop.split(self.DUPLICATE_SEPARATOR, maxsplit=1)
         except ValueError:
             raise ParsingError('Value of the "for" argument must contain "in" in it')
 
         source = exec_python_specifier(source_cv, context, None)
+        state = _render_state.get()
 
         # 'a, b , c' -> ['a', 'b', 'c']
         cvs = list(map(lambda x: x.strip(), cvs.split(',')))
 
         # <tag for="a,b in [(val1, val2), (val3, val4), ...]"/>
         if len(cvs) > 1:
-            yield from (ReadOnlyDict(**context, **{cv: item for cv, item in zip(cvs, value)})
-                        for value in source)
+            for iteration, value in enumerate(source):
+                state.count_iteration(iteration)
+                yield ReadOnlyDict(context, **{cv: item for cv, item in zip(cvs, value)})
             return
 
         # <tag for="a in [val1, val2, ...]"/>
         cv, = cvs
-        yield from (ReadOnlyDict(**context, **{cv: value}) for value in source)
+        for iteration, value in enumerate(source):
+            state.count_iteration(iteration)
+            yield ReadOnlyDict(context, **{cv: value})
 
     def parse(self, element: Element, context: ReadOnlyDict) -> Any:
+        # Ограничения действуют на render целиком, поэтому состояние
+        # создаётся только самой внешней областью
+        if _render_state.get(None) is not None:
+            return self._parse(element, context)
+
+        state = _render_state.set(RenderState(_render_limits))
+        try:
+            return self._parse(element, context)
+        finally:
+            _render_state.reset(state)
+
+    def _parse(self, element: Element, context: ReadOnlyDict) -> Any:
+        if self.is_assembler:
+            assembler = self.parsing_function()
+
+            cond_status = MutableVariable(None)
+            for element in element.childNodes:
+                self.process(assembler, element, context, cond_status)
+
+            return assembler.result()
+
         parser = self.parsing_function()
 
         try:
@@ -426,10 +680,10 @@ class ParsingScope:
         except StopIteration:
             raise ParsingCoroutineError('Parser returned StopIteration after receiving StopParsing')
 
-    def process(self, parser: Generator, element: Element, context: ReadOnlyDict,
+    def process(self, parser: Union[Generator, Assembler], element: Element, context: ReadOnlyDict,
                 cond_status: MutableVariable[Optional[bool]]):
 
-        if element.nodeType == Element.TEXT_NODE and self.text_handler:
+        if element.nodeType == Element.TEXT_NODE and (self.text_handler or self._load_text_handler()):
             tag = Tag(self, parser, element, context)
             token = self.text_handler(tag)
             self.send(parser, token)
@@ -438,28 +692,19 @@ class ParsingScope:
         if element.nodeType != Element.ELEMENT_NODE:
             return
 
-        # Предполагается, что словарь будет изменяться методами
-        # __display__ и __duplicate__, конкретно - будут удаляться
-        # атрибуты 'if' и 'for', если они есть
-        attributes = dict(element.attributes.items())
+        info = self.ElementInfo.of(element)
 
-        if not self.__display__(attributes, context, cond_status):
+        if not self.__display__(info, context, cond_status):
             return
 
         try:
             handler = self.handlers[element.tagName]
         except KeyError:
-            raise ParsingError(f'Got unexpected tag "{element.tagName}"')
+            handler = self._load_handler(element.tagName)
 
-        for child_context in self.__duplicate__(attributes, context):
+        for child_context in self.__duplicate__(info, context):
             tag = Tag(self, parser, element, child_context)
-            arguments = self.__arguments__(
-                handler.annotations,
-                handler.defaults,
-                handler.takes_remaining,
-                attributes,
-                child_context
-            )
+            arguments = self.__arguments__(handler, info, child_context)
             token = handler.function(tag, **arguments)
 
             # Обработчик не вернул значения
@@ -468,7 +713,17 @@ class ParsingScope:
 
             self.send(parser, token)
 
-    def send(self, parser: Generator, token: Any):
+    def send(self, parser: Union[Generator, Assembler], token: Any):
+        _render_state.get().count_token()
+
+        if self.is_assembler:
+            try:
+                method = parser.__dispatch__[token.__class__]
+            except KeyError:
+                method = parser.resolve(token)
+            method(parser, token)
+            return
+
         if token is StopParsing:
             raise ParsingError('Attempt to return "StopParsing" from the handler')
 
@@ -478,6 +733,29 @@ class ParsingScope:
             raise ParsingCoroutineError(f'Parser returned StopIteration after receiving '
                                         f'"{token}" (type={type(token)})')
 
+    def _load_handler(self, name: str) -> Handler:
+        """ Импортирует модуль, регистрирующий обработчик тега """
+        try:
+            module = self.lazy_handlers[name]
+        except KeyError:
+            raise ParsingError(f'Got unexpected tag "{name}"')
+
+        lazy_import(module)
+
+        try:
+            return self.handlers[name]
+        except KeyError:
+            raise RegistrationError(f'Module "{module}" did not register handler for tag "{name}"')
+
+    def _load_text_handler(self) -> Optional[Callable]:
+        """ Импортирует модуль, регистрирующий текстовый обработчик, если он указан """
+        if self.lazy_text_handler is None:
+            return None
+
+        lazy_import(self.lazy_text_handler)
+        self.lazy_text_handler = None
+        return self.text_handler
+
     # Регистрация обработчиков --------------------------------------
 
     def _register(self, func, name: Union[list[str] | str] = None, override: bool = False,
@@ -561,6 +839,73 @@ class ParsingScope:
         self.text_handler = func
         return func
 
+    def register_lazy(self, name: Union[list[str] | str], module: str):
+        """
+        Откладывает регистрацию обработчиков тегов до первого использования.
+        Когда в шаблоне впервые встретится тег с указанным именем, будет
+        импортирован module, который должен зарегистрировать обработчик
+        с помощью `register`
+
+        :param name: Имена тегов, обработчики которых регистрирует модуль
+        :param module: Полное имя модуля
+        """
+        if isinstance(name, str):
+            name = [name]
+
+        for alias in name:
+            self.lazy_handlers[alias] = module
+
+    def register_lazy_text(self, module: str):
+        """
+        Откладывает регистрацию текстового обработчика до первого текстового
+        элемента. Модуль должен зарегистрировать обработчик с помощью `register_text`
+        """
+        self.lazy_text_handler = module
+
+
+def is_static(element: Element) -> bool:
+    """
+    Возвращает True, если элемент и все его потомки не зависят от контекста:
+    не используют "if", "else-if", "else" и "for", а в их атрибутах и тексте
+    нет подстановок и спецификаторов, кроме "nf"
+    """
+    return ParsingScope.ElementInfo.of(element).is_static(element)
+
+
+def memoize_static(func: Callable) -> Callable:
+    """
+    Декоратор обработчика тега. Для статичных элементов (см. `is_static`)
+    обработчик вызывается один раз, а при следующих render-ах возвращается
+    тот же токен. Поэтому токен не должен изменяться после создания.
+
+    Например::
+
+        @register([INLINE_KEYBOARD])
+        @memoize_static
+        def button(tag: Tag, *, cd: str = None) -> InlineKeyboardButton:
+            ...
+
+    """
+    @functools.wraps(func)
+    def wrapper(tag: 'Tag', **kwargs):
+        info = ParsingScope.ElementInfo.of(tag.element)
+
+        if not info.is_static(tag.element):
+            return func(tag, **kwargs)
+
+        if info.memo is None:
+            info.memo = {}
+
+        try:
+            return info.memo[func]
+        except KeyError:
+            token = info.memo[func] = func(tag, **kwargs)
+            return token
+
+    # Значения по умолчанию извлекаются при регистрации из __kwdefaults__
+    wrapper.__kwdefaults__ = func.__kwdefaults__
+    return wrapper
+
 
 def register_text(parsers: Iterable[ParsingScope]) -> Callable:
     """
@@ -605,11 +950,35 @@ def register(scopes: Iterable[ParsingScope], name: Union[list[str] | str] = None
     return decorator
 
 
+def register_lazy(scopes: Iterable[ParsingScope], name: Union[list[str] | str], module: str):
+    """
+    Откладывает регистрацию обработчиков тегов до первого использования,
+    см. `ParsingScope.register_lazy`
+
+    :param scopes: Области, в которых модуль регистрирует обработчики
+    :param name: Имена тегов, обработчики которых регистрирует модуль
+    :param module: Полное имя модуля
+    """
+    for scope in scopes:
+        scope.register_lazy(name, module)
+
+
+def register_lazy_text(scopes: Iterable[ParsingScope], module: str):
+    """
+    Откладывает регистрацию текстового обработчика до первого текстового
+    элемента, см. `ParsingScope.register_lazy_text`
+    """
+    for scope in scopes:
+        scope.register_lazy_text(module)
+
+
 class Tag:
+    __slots__ = ('_scope', '_parser', '_element', '_context')
+
     def __init__(
             self,
             scope: ParsingScope,
-            parser: Generator,
+            parser: Union[Generator, Assembler],
             element: Element,
             context: ReadOnlyDict
     ):
@@ -626,6 +995,11 @@ class Tag:
     def context(self):
         return self._context
 
+    @property
+    def locale(self) -> Optional[str]:
+        """ Локаль текущего render-а, используется при подключении шаблонов """
+        return _render_state.get().locale
+
     def process(self, element: Element, context: Union[ReadOnlyDict, dict] = None,
                 cond_status: MutableVariable[Optional[bool]] = None):
         """
@@ -749,9 +1123,37 @@ class Tag:
         # но может начать при наследовании
         return self._scope.send(self._parser, token)
 
+    @contextlib.contextmanager
+    def include(self):
+        """
+        Отмечает обработку подключаемого шаблона, чтобы ограничить глубину
+        вложенности, например при рекурсивном подключении шаблонов::
+
+            @register([EXAMPLE])
+            def template(tag: Tag, *, src: str):
+                with tag.include():
+                    for element in load_document(src).documentElement.childNodes:
+                        tag.process(element)
+
+        """
+        state = _render_state.get()
+        limit = state.limits.max_include_depth
+
+        if limit is not None and state.include_depth >= limit:
+            state.exceeded('include_depth', f'Templates are included deeper than {limit} levels')
+
+        state.include_depth += 1
+        try:
+            yield
+        finally:
+            state.include_depth -= 1
+
 
 _default_syntax: Optional[ParsingScope] = None
 _global_context: dict = {}
+_documents: dict[str, Document] = {}
+_localized_documents: dict[tuple[str, str], Document] = {}
+_catalogs: dict[str, dict[str, str]] = {}
 
 
 def set_default_syntax(syntax: ParsingScope):
@@ -776,7 +1178,163 @@ def get_global_context() -> dict:
     return _global_context
 
 
-def render_document(document: Document, context: dict, path: str = None, syntax: ParsingScope = None):
+def set_render_limits(limits: RenderLimits):
+    """ Устанавливает ограничения render-а глобально """
+    global _render_limits
+    _render_limits = limits
+
+
+def get_render_limits() -> RenderLimits:
+    """ Возвращает установленные глобально ограничения render-а """
+    return _render_limits
+
+
+def set_catalog(locale: str, catalog: dict[str, str]):
+    """
+    Устанавливает каталог переводов для локали. Ключами каталога являются
+    тексты шаблона с нормализованными пробелами, значениями - переводы::
+
+        >>> set_catalog('en', {'Привет, {name}!': 'Hello, {name}!'})
+
+    Закешированные варианты шаблонов для этой локали сбрасываются.
+    """
+    _catalogs[locale] = catalog
+    for key in [key for key in _localized_documents if key[1] == locale]:
+        del _localized_documents[key]
+
+
+def get_catalog(locale: str) -> Optional[dict[str, str]]:
+    """ Возвращает каталог переводов локали """
+    return _catalogs.get(locale)
+
+
+def _localize(document: Document, catalog: dict[str, str]) -> Document:
+    """ Заменяет тексты документа их переводами из каталога """
+    nodes = [document]
+    while nodes:
+        node = nodes.pop()
+        if node.nodeType == node.TEXT_NODE:
+            try:
+                node.data = catalog[' '.join(node.data.split())]
+            except KeyError:
+                pass
+            continue
+        nodes.extend(node.childNodes)
+    return document
+
+
+def _compile_template(path: str) -> tuple[Document, float, int]:
+    """ Разбирает файл шаблона, замеряя время и пиковое потребление памяти """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+
+    started = time.perf_counter()
+    try:
+        document = minidom.parse(path)
+    except ExpatError as error:
+        raise ParsingError(f'Syntax error in template "{path}": {error}')
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        if not tracing:
+            tracemalloc.stop()
+    return document, elapsed, peak
+
+
+def find_static_values(document: Document, tags: Iterable[str], attribute: str) -> set[str]:
+    """ Возвращает значения атрибута у элементов с указанными тегами. Значения,
+        зависящие от контекста, пропускаются """
+    values = set()
+    for tag in tags:
+        for element in document.getElementsByTagName(tag):
+            for name in (attribute, f'{attribute}.nf'):
+                value = element.getAttribute(name)
+                if not value:
+                    continue
+                if name == attribute and ('{' in value or '}' in value):
+                    continue
+                values.add(value)
+    return values
+
+
+def _find_dependencies(document: Document, include_tag: str, include_attribute: str) -> set[str]:
+    """ Возвращает пути шаблонов, подключаемых документом. Пути, значения
+        которых зависят от контекста, пропускаются """
+    return set(map(os.path.abspath, find_static_values(document, [include_tag], include_attribute)))
+
+
+def load_document(path: Union[str, Path], locale: str = None) -> Document:
+    """ Возвращает разобранный документ шаблона. Документ разбирается
+        один раз, последующие вызовы возвращают закешированный результат.
+        Если указана локаль, тексты документа переводятся по каталогу
+        локали, и переведённый вариант кешируется отдельно """
+    key = os.path.abspath(path)
+
+    if locale is not None and (catalog := _catalogs.get(locale)) is not None:
+        try:
+            return _localized_documents[key, locale]
+        except KeyError:
+            pass
+        document = _localize(load_document(key).cloneNode(True), catalog)
+        _localized_documents[key, locale] = document
+        return document
+
+    try:
+        return _documents[key]
+    except KeyError:
+        pass
+    try:
+        document = _documents[key] = minidom.parse(key)
+    except ExpatError as error:
+        raise ParsingError(f'Syntax error in template "{path}": {error}')
+    return document
+
+
+def clear_document_cache():
+    """ Сбрасывает кеш разобранных документов """
+    _documents.clear()
+    _localized_documents.clear()
+
+
+def warm_up(paths: Iterable[Union[str, Path]], include_tag: str = 'template', include_attribute: str = 'src'):
+    """
+    Заранее разбирает указанные шаблоны и все подключаемые ими шаблоны,
+    чтобы первый render не происходил во время обработки пользовательских
+    запросов. Синтаксическая ошибка пробрасывается сразу.
+
+    Шаблоны разбираются последовательно: minidom удерживает GIL, а передача
+    документов из пула процессов обходится дороже самого разбора.
+
+    Для каждого шаблона в лог пишется время разбора и пиковое
+    потребление памяти.
+
+    :param paths: Пути к файлам шаблонов.
+    :param include_tag: Тег, которым шаблоны подключают другие шаблоны.
+    :param include_attribute: Атрибут тега include_tag, содержащий путь к шаблону.
+    """
+    queued = {os.path.abspath(path) for path in paths}
+    pending = list(queued)
+
+    while pending:
+        path = pending.pop()
+
+        document = _documents.get(path)
+        if document is None:
+            document, elapsed, peak = _compile_template(path)
+            _documents[path] = document
+            logger.info('Template "%s" compiled in %.2f ms, peak memory %.1f KiB',
+                        path, elapsed * 1000, peak / 1024)
+
+        for dependency in _find_dependencies(document, include_tag, include_attribute) - queued:
+            queued.add(dependency)
+            pending.append(dependency)
+
+
+def render_document(document: Document, context: dict, path: str = None, syntax: ParsingScope = None,
+                    locale: str = None):
     global _default_syntax
     global _global_context
 
@@ -788,26 +1346,44 @@ def render_document(document: Document, context: dict, path: str = None, syntax:
     if path:
         path = Path(path)
         _context.update(__dir__=path.parent, __file__=path)
+    _context.update(__locale__=locale)
     _context.update(context)
 
-    # noinspection PyTypeChecker
-    return syntax.parse(document, ReadOnlyDict(_context))
+    state = _render_state.set(RenderState(_render_limits, locale))
+    try:
+        # noinspection PyTypeChecker
+        return syntax.parse(document, ReadOnlyDict(_context))
+    finally:
+        _render_state.reset(state)
+
 
+def render_string(string: str, context: dict, syntax: ParsingScope = None, locale: str = None):
+    document = minidom.parseString(string)
+
+    if locale is not None and (catalog := _catalogs.get(locale)) is not None:
+        _localize(document, catalog)
 
-def render_string(string: str, context: dict, syntax: ParsingScope = None):
     return render_document(
-        minidom.parseString(string),
+        document,
         context,
-        syntax=syntax
+        syntax=syntax,
+        locale=locale
     )
 
 
-def render(path: str, context: dict, syntax: ParsingScope = None):
+def render(path: str, context: dict, syntax: ParsingScope = None, locale: str = None):
+    """
+    Отображает шаблон. Если указана локаль, используется вариант шаблона,
+    переведённый по каталогу локали (см. `set_catalog`). Перевод выполняется
+    один раз при первом обращении к варианту, поэтому во время render-а
+    поиск переводов не производится.
+    """
     return render_document(
-        minidom.parse(path),
+        load_document(path, locale),
         context,
         path=path,
-        syntax=syntax
+        syntax=syntax,
+        locale=locale
     )
 
 
@@ -821,6 +1397,10 @@ __all__ = (
     'ParsingCoroutineError',
     'SpecifierError',
     'ConvertingError',
+    'BudgetExceededError',
+    'metrics',
+    'RenderLimits',
+    'RenderState',
     'ConvertBy',
     'str2bool',
     'str2list',
@@ -831,14 +1411,29 @@ __all__ = (
     'converters',
     'specifiers',
     'StopParsing',
+    'accepts',
+    'Assembler',
     'ParsingScope',
+    'is_static',
+    'memoize_static',
     'register_text',
     'register',
+    'register_lazy',
+    'register_lazy_text',
+    'lazy_import',
     'Tag',
     'set_default_syntax',
     'set_global_context',
     'get_default_syntax',
     'get_global_context',
+    'set_render_limits',
+    'get_render_limits',
+    'set_catalog',
+    'get_catalog',
+    'load_document',
+    'clear_document_cache',
+    'find_static_values',
+    'warm_up',
     'render_document',
     'render_string',
     'render',
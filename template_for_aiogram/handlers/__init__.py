@@ -0,0 +1,30 @@
+"""
+Обработчики тегов регистрируются при первом использовании тега. Модули
+с медиа и клавиатурами импортируют aiogram, поэтому при импорте
+template_for_aiogram он не загружается.
+"""
+from template.dev import register_lazy, register_lazy_text
+from template_for_aiogram.scopes import *
+
+TEXT = 'template_for_aiogram.handlers.text'
+MEDIA = 'template_for_aiogram.handlers.media'
+KEYBOARDS = 'template_for_aiogram.handlers.keyboards'
+
+register_lazy([DOCUMENT], 'message', TEXT)
+register_lazy_text([MESSAGE, ELEMENT, NO_HTML, PLAIN_TEXT], TEXT)
+register_lazy([MESSAGE, ELEMENT], [
+    'template', 'paste', 'heading', 'section', 'p', 'br', 'span', 'a', 'b', 'strong', 'i', 'em', 'code',
+    's', 'strike', 'del', 'u', 'pre'
+], TEXT)
+register_lazy([NO_HTML], 'span', TEXT)
+
+register_lazy([MESSAGE], [
+    'link-preview', 'photo', 'img', 'image', 'animation', 'video', 'document', 'audio', 'album'
+], MEDIA)
+register_lazy([ALBUM], ['photo', 'img', 'image', 'video', 'document', 'audio'], MEDIA)
+
+register_lazy([MESSAGE], ['inline-keyboard', 'reply-keyboard'], KEYBOARDS)
+register_lazy([INLINE_KEYBOARD], ['row', 'paged-keyboard', 'button'], KEYBOARDS)
+register_lazy([INLINE_KEYBOARD_ROW], 'button', KEYBOARDS)
+register_lazy([REPLY_KEYBOARD], ['row', 'button'], KEYBOARDS)
+register_lazy([REPLY_KEYBOARD_ROW], 'button', KEYBOARDS)
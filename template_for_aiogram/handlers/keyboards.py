@@ -0,0 +1,232 @@
+import functools
+from typing import Any, Optional
+
+from aiogram.types import InlineKeyboardMarkup, WebAppInfo, LoginUrl, CallbackGame, InlineKeyboardButton, \
+    ReplyKeyboardMarkup, KeyboardButtonPollType, KeyboardButton
+
+from template.dev import *
+from template_for_aiogram.scopes import *
+from template_for_aiogram.types import *
+
+
+@register([MESSAGE], name='inline-keyboard')
+@memoize_static
+def inline_keyboard(tag: Tag) -> InlineKeyboardMarkup:
+    """
+        Inline-клавиатура.
+
+        ::
+
+            │ <inline-keyboard>
+            │     ... INLINE_KEYBOARD ...
+            │ </inline-keyboard>
+            └── MESSAGE Scope
+
+        Клавиатуры, строки и кнопки, не зависящие от контекста, создаются
+        один раз и переиспользуются при следующих render-ах.
+
+    """
+    layout = INLINE_KEYBOARD.parse(tag.element, tag.context)
+    return construct(InlineKeyboardMarkup, inline_keyboard=layout)
+
+
+@register([INLINE_KEYBOARD], name='row')
+@memoize_static
+def row_inline_keyboard(tag: Tag) -> KeyboardLayoutRow:
+    """
+        Строка inline-клавиатуры.
+
+        ::
+
+            │ <row>
+            │     ... INLINE_KEYBOARD_ROW ...
+            │ </row>
+            └── INLINE_KEYBOARD Scope
+
+    """
+    return INLINE_KEYBOARD_ROW.parse(tag.element, tag.context)
+
+
+def _navigate_named(navigate: Any, name: str, page: int) -> str:
+    return navigate(page, name)
+
+
+@register([INLINE_KEYBOARD], name='paged-keyboard')
+def paged_keyboard(tag: Tag, *, source: Any, page: int = 0, page_size: int = 10, item: str = 'item',
+                   navigate: Any = None, name: str = None, prev_text: str = '«',
+                   next_text: str = '»') -> Optional[KeyboardLayoutRow]:
+    """
+        Постраничная inline-клавиатура.
+
+        ::
+
+            │ <paged-keyboard>
+            │     ... INLINE_KEYBOARD ...
+            │ </paged-keyboard>
+            └── INLINE_KEYBOARD Scope
+
+        Аргументы::
+
+            <paged-keyboard source: (Iterable|Page)[ page: int][ page_size: int][ item: str]
+                [ navigate: Callable[[int], str]][ name: str][ prev_text: str][ next_text: str]/>
+
+            source - Источник элементов, обычно передаётся через "source.cv". Из него
+                берутся только элементы текущей страницы. Асинхронные источники
+                загружаются заранее через `fetch_page` и передаются как Page.
+            page - Номер страницы, начиная с 0.
+            item - Имя переменной контекста, в которой содержимое получает элемент.
+            navigate - Функция, возвращающая callback_data перехода на страницу. По
+                умолчанию берётся переменная контекста "paginate".
+            name - Имя клавиатуры, передаётся в navigate вторым аргументом. Нужно,
+                если в сообщении несколько постраничных клавиатур.
+
+        Содержимое повторяется для каждого элемента страницы, после чего
+        добавляется строка с кнопками перехода на соседние страницы.
+
+    """
+    if not isinstance(source, Page):
+        source = take_page(source, page, page_size)
+
+    for value in source.items:
+        context = ReadOnlyDict(tag.context, **{item: value})
+
+        cond_status = MutableVariable(None)
+        for element in tag.element.childNodes:
+            tag.process(element, context, cond_status)
+
+    if source.number == 0 and not source.has_next:
+        return None
+
+    if navigate is None:
+        navigate = tag.context.get('paginate')
+    if navigate is None:
+        raise ParsingError('paged-keyboard requires "navigate" argument or "paginate" context variable')
+
+    if name is not None:
+        navigate = functools.partial(_navigate_named, navigate, name)
+
+    buttons = KeyboardLayoutRow()
+
+    if source.number > 0:
+        buttons.append(construct(InlineKeyboardButton, text=prev_text, callback_data=navigate(source.number - 1)))
+
+    if source.has_next:
+        buttons.append(construct(InlineKeyboardButton, text=next_text, callback_data=navigate(source.number + 1)))
+
+    return buttons
+
+
+@register([INLINE_KEYBOARD, INLINE_KEYBOARD_ROW], name='button')
+@memoize_static
+def button_inline_keyboard(tag: Tag, *, text: str = None, url: str = None, callback_data: str = None,
+                           web_app: WebAppInfo = None, login_url: LoginUrl = None,
+                           switch_inline_query: str = None, switch_inline_query_current_chat: str = None,
+                           callback_game: CallbackGame = None, pay: bool = False, cd: str = None) \
+        -> InlineKeyboardButton:
+    """
+        Кнопка inline-клавиатуры.
+
+        ::
+
+            │ <button>
+            │     ... PLAIN_TEXT ...
+            │ </button>
+            └── INLINE_KEYBOARD/INLINE_KEYBOARD_ROW Scope
+
+        Аргументы::
+
+            <button[ text: str][ url: str][ callback_data: str][ web_app: WebAppInfo][ login_url: LoginUrl]
+                [ switch_inline_query: str][ switch_inline_query_current_chat: str]
+                [ callback_game: CallbackGame][ pay: bool][ cd: str]/>
+
+            cd - сокращённый способ использовать "callback_data". Если указано и то и другое,
+            предпочтение отдаётся "callback_data".
+
+    """
+
+    if text is None:
+        text = PLAIN_TEXT.parse(tag.element, tag.context)
+
+    return construct(
+        InlineKeyboardButton,
+        text=text, url=url, callback_data=callback_data or cd, web_app=web_app, login_url=login_url,
+        switch_inline_query=switch_inline_query, switch_inline_query_current_chat=switch_inline_query_current_chat,
+        callback_game=callback_game, pay=pay
+    )
+
+
+@register([MESSAGE], name='reply-keyboard')
+@memoize_static
+def reply_keyboard(tag: Tag, *, resize_keyboard: bool = None, one_time_keyboard: bool = None,
+                   input_field_placeholder: str = None, selective: bool = None) -> ReplyKeyboardMarkup:
+    """
+        Reply-клавиатура.
+
+        ::
+
+            │ <reply-keyboard>
+            │     ... REPLY_KEYBOARD ...
+            │ </reply-keyboard>
+            └── MESSAGE Scope
+
+        Аргументы::
+
+            <reply-keyboard[ resize_keyboard: bool][ one_time_keyboard: bool][ input_field_placeholder: str]
+                [ selective: bool]/>
+
+    """
+
+    layout = REPLY_KEYBOARD.parse(tag.element, tag.context)
+    return construct(
+        ReplyKeyboardMarkup,
+        keyboard=layout, resize_keyboard=resize_keyboard, one_time_keyboard=one_time_keyboard,
+        input_field_placeholder=input_field_placeholder, selective=selective
+    )
+
+
+@register([REPLY_KEYBOARD], name='row')
+@memoize_static
+def row_reply_keyboard(tag: Tag) -> KeyboardLayoutRow:
+    """
+        Строка reply-клавиатуры.
+
+        ::
+
+            │ <row>
+            │     ... REPLY_KEYBOARD_ROW ...
+            │ </row>
+            └── REPLY_KEYBOARD Scope
+
+    """
+    return REPLY_KEYBOARD_ROW.parse(tag.element, tag.context)
+
+
+@register([REPLY_KEYBOARD, REPLY_KEYBOARD_ROW], name='button')
+@memoize_static
+def button_reply_keyboard(tag: Tag, *, text: str = None, request_contact: bool = None, request_location: bool = None,
+                          request_poll: KeyboardButtonPollType = None, web_app: WebAppInfo = None) -> KeyboardButton:
+    """
+        Кнопка reply-клавиатуры.
+
+        ::
+
+            │ <button>
+            │     ... PLAIN_TEXT ...
+            │ </button>
+            └── REPLY_KEYBOARD/REPLY_KEYBOARD_ROW Scope
+
+        Аргументы::
+
+            <button[ text: str][ request_contact: bool][ request_location: bool]
+                [ request_poll: KeyboardButtonPollType][ web_app: WebAppInfo]/>
+
+    """
+
+    if text is None:
+        text = PLAIN_TEXT.parse(tag.element, tag.context)
+
+    return construct(
+        KeyboardButton,
+        text=text, request_contact=request_contact, request_location=request_location, request_poll=request_poll,
+        web_app=web_app
+    )
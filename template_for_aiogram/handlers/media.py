@@ -0,0 +1,134 @@
+from classes.media_cache import resolve_media
+from classes.message_editor import MeLinkPreview, MePhoto, MeAnimation, MeVideo, MeDocument, MeAudio, MeAlbum
+from template.dev import *
+from template_for_aiogram.scopes import *
+from template_for_aiogram.types import *
+
+
+@register([MESSAGE], name='link-preview')
+def link_preview(_, *, url: str, size_hint: str = None, position: str = None) -> MeLinkPreview:
+    if size_hint not in ('small', 'large'):
+        raise ParsingError(f'link-preview.size_hint expected value "small" or "large", got "{size_hint}"')
+
+    if position not in ('above', 'below'):
+        raise ParsingError(f'link-preview.position expected value "above" or "below", got "{position}"')
+
+    return construct(MeLinkPreview, url=url, size_hint=size_hint, position=position)
+
+
+@register([MESSAGE, ALBUM], name=['photo', 'img', 'image'])
+def photo(_, *, src: str, has_spoiler: bool = None) -> MePhoto:
+    """
+        Изображение.
+
+        ::
+
+            │ <photo/>
+            └── MESSAGE/ALBUM Scope
+
+        Аргументы::
+
+            <photo src: (str|InputFile)[ has_spoiler: bool]/>
+            src - InputFile, File-ID или uri-изображения.
+
+    """
+    # InputFile can be provided via context vars. Local files already
+    # uploaded once are replaced with their file_id
+    return construct(MePhoto, photo=resolve_media(src), has_spoiler=has_spoiler)
+
+
+@register([MESSAGE])
+def animation(_, *, src: str, duration: int = None, width: int = None, height: int = None, thumbnail: str = None,
+              has_spoiler: bool = None) -> MeAnimation:
+    """
+        Анимация.
+
+        ::
+
+            │ <anim/>
+            └── MESSAGE Scope
+
+        Аргументы::
+
+            <anim src: (str|InputFile)[ duration: int][ width: int][ height: int][ thumbnail: InputFile]
+                [ has_spoiler: bool]/>
+            src - InputFile, File-ID или uri-анимации.
+
+    """
+    # InputFile can be provided via context vars. Local files already
+    # uploaded once are replaced with their file_id
+    return construct(
+        MeAnimation,
+        animation=resolve_media(src),
+        duration=duration,
+        width=width,
+        height=height,
+        thumbnail=thumbnail,
+        has_spoiler=has_spoiler
+    )
+
+
+@register([MESSAGE, ALBUM])
+def video(_, *, src: str, duration: int = None, width: int = None, height: int = None, thumbnail: str = None,
+          has_spoiler: bool = None, supports_streaming: bool = None) -> MeVideo:
+    # InputFile can be provided via context vars. Local files already
+    # uploaded once are replaced with their file_id
+    return construct(
+        MeVideo,
+        video=resolve_media(src),
+        duration=duration,
+        width=width,
+        height=height,
+        thumbnail=thumbnail,
+        has_spoiler=has_spoiler,
+        supports_streaming=supports_streaming
+    )
+
+
+@register([MESSAGE, ALBUM])
+def document(_, *, src: str, thumbnail: str = None, disable_content_type_detection: bool = None) -> MeDocument:
+    # InputFile can be provided via context vars. Local files already
+    # uploaded once are replaced with their file_id
+    return construct(
+        MeDocument,
+        document=resolve_media(src),
+        thumbnail=thumbnail,
+        disable_content_type_detection=disable_content_type_detection
+    )
+
+
+@register([MESSAGE, ALBUM])
+def audio(_, *, src: str, duration: int = None, performer: str = None, title: str = None,
+          thumbnail: str = None) -> MeAudio:
+    # InputFile can be provided via context vars. Local files already
+    # uploaded once are replaced with their file_id
+    return construct(
+        MeAudio,
+        audio=resolve_media(src),
+        duration=duration,
+        performer=performer,
+        title=title,
+        thumbnail=thumbnail
+    )
+
+
+@register([MESSAGE])
+def album(tag: Tag) -> MeAlbum:
+    """
+        Группа медиа, отправляемая одним сообщением.
+
+        ::
+
+            │ <album>
+            │     ... ALBUM Scope ...
+            │ </album>
+            └── MESSAGE Scope
+
+        Альбом содержит от 2 до 10 фото, видео, документов или аудио.
+        Фото и видео можно смешивать, документы и аудио - нет. Текст
+        сообщения становится подписью первого элемента, клавиатура
+        к альбому не прикрепляется.
+
+    """
+    return ALBUM.parse(tag.element, tag.context)
+
@@ -1,10 +1,7 @@
-import re
-from typing import Any
+import functools
+import string
+from typing import Any, Optional
 
-from aiogram.types import InlineKeyboardMarkup, WebAppInfo, LoginUrl, CallbackGame, InlineKeyboardButton, \
-    ReplyKeyboardMarkup, KeyboardButtonPollType, KeyboardButton
-
-from classes.message_editor import MeLinkPreview, MePhoto, MeAnimation, MeVideo, MeDocument, MeAudio
 from template.dev import *
 from template_for_aiogram.scopes import *
 from template_for_aiogram.types import *
@@ -74,7 +71,7 @@ def template(tag: Tag, *, src: str, __rem: dict):
     """
 
     from xml.dom import minidom
-    document = minidom.parse(src)
+    document = load_document(src, tag.locale)
     tmpl: minidom.Element = document.childNodes[0]
 
     # Enforcing correct syntax
@@ -101,8 +98,9 @@ def template(tag: Tag, *, src: str, __rem: dict):
     # Processing template elements
 
     cond_status = MutableVariable(None)
-    for element in tmpl.childNodes:
-        tag.process(element, ReadOnlyDict(__rem), cond_status)
+    with tag.include():
+        for element in tmpl.childNodes:
+            tag.process(element, ReadOnlyDict(__rem), cond_status)
 
 
 @register([MESSAGE, ELEMENT])
@@ -131,16 +129,72 @@ def paste(_, value: str) -> Text:
     return Text(value)
 
 
-SPACING_PATTERN = re.compile(r'\s+')
+HTML_ESCAPE_TABLE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+_formatter = string.Formatter()
+
+
+def escape_html(value: str) -> str:
+    """ Экранирует спецсимволы HTML за один проход """
+    return value.translate(HTML_ESCAPE_TABLE)
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_text(value: str) -> tuple[tuple[str, Optional[str], Optional[str], Optional[str]], ...]:
+    """ Нормализует пробелы и разбирает текст на части для форматирования.
+        Текст шаблона экранируется здесь же: minidom уже раскрыл сущности,
+        поэтому `&lt;b&gt;` в шаблоне стал бы тегом. Выполняется один раз
+        для каждого текста шаблона """
+    return tuple(
+        (escape_html(literal), field, format_spec, conversion)
+        for literal, field, format_spec, conversion in _formatter.parse(' '.join(value.split()))
+    )
+
+
+def format_escaped(pieces: tuple, context: dict) -> str:
+    """
+    Форматирует разобранный текст, экранируя подставляемые значения. Значения
+    типа Safe не экранируются, текст самого шаблона уже экранирован в _compile_text.
+    """
+    result = []
+
+    for literal, field, format_spec, conversion in pieces:
+        if literal:
+            result.append(literal)
+
+        if field is None:
+            continue
+
+        value, _ = _formatter.get_field(field, (), context)
+        if conversion:
+            value = _formatter.convert_field(value, conversion)
+        if format_spec and '{' in format_spec:
+            format_spec = _formatter.vformat(format_spec, (), context)
+
+        if isinstance(value, Safe):
+            result.append(format(value, format_spec))
+        else:
+            result.append(format(value, format_spec).translate(HTML_ESCAPE_TABLE))
+
+    return ''.join(result)
 
 
 @register_text([MESSAGE, ELEMENT, NO_HTML])
 def _text_(tag: Tag) -> Paragraph:
-    """ Не обрамлённый в теги текст """
-    words = re.split(SPACING_PATTERN, tag.element.nodeValue)
-    result = ' '.join(words).strip().format_map(tag.context)
-    result = result.replace('<', '&lt;').replace('>', '&gt;')
-    return Text(result)
+    """ Не обрамлённый в теги текст. Подставляемые значения экранируются """
+    pieces = _compile_text(tag.element.nodeValue)
+
+    # Текст без подстановок
+    if len(pieces) == 1 and pieces[0][1] is None:
+        return Text(pieces[0][0])
+
+    return Text(format_escaped(pieces, tag.context))
+
+
+@register_text([PLAIN_TEXT])
+def _plain_text_(tag: Tag) -> Text:
+    """ Текст вне HTML, например, подпись кнопки. Ничего не экранируется """
+    return Text(' '.join(tag.element.nodeValue.split()).format_map(tag.context))
 
 
 @register([MESSAGE, ELEMENT])
@@ -154,7 +208,7 @@ def heading(tag: Tag) -> Paragraph:
         ::
 
             │ <heading>
-            │     ... NO_HTML Scope ...
+            │     ... PLAIN_TEXT Scope ...
             │ <heading/>
             └── MESSAGE/ELEMENT Scope
 
@@ -169,7 +223,8 @@ def heading(tag: Tag) -> Paragraph:
             MessageRender('<b>HELLO!</b>')
 
     """
-    return Paragraph(f'<b>{NO_HTML.parse(tag.element, tag.context).upper()}</b>')
+    # Переводится в верхний регистр до экранирования, иначе `&amp;` станет `&AMP;`
+    return Paragraph(f'<b>{escape_html(PLAIN_TEXT.parse(tag.element, tag.context).upper())}</b>')
 
 
 @register([MESSAGE, ELEMENT])
@@ -520,7 +575,7 @@ def pre(tag: Tag, *, language: str = None) -> Text:
 
     """
     result = tag.element.nodeValue.format_map(tag.context)
-    result = result.replace('<', '&lt;').replace('>', '&gt;')
+    result = escape_html(result)
 
     arg = (
         '' if language is None
@@ -528,242 +583,3 @@ def pre(tag: Tag, *, language: str = None) -> Text:
     )
     return Paragraph(f'<pre{arg}>{result}</pre>')
 
-
-@register([MESSAGE], name='link-preview')
-def link_preview(_, *, url: str, size_hint: str = None, position: str = None) -> MeLinkPreview:
-    if size_hint not in ('small', 'large'):
-        raise ParsingError(f'link-preview.size_hint expected value "small" or "large", got "{size_hint}"')
-
-    if position not in ('above', 'below'):
-        raise ParsingError(f'link-preview.position expected value "above" or "below", got "{position}"')
-
-    return MeLinkPreview(url=url, size_hint=size_hint, position=position)
-
-
-@register([MESSAGE], name=['photo', 'img', 'image'])
-def photo(_, *, src: str, has_spoiler: bool = None) -> MePhoto:
-    """
-        Изображение.
-
-        ::
-
-            │ <photo/>
-            └── MESSAGE Scope
-
-        Аргументы::
-
-            <photo src: (str|InputFile)[ has_spoiler: bool]/>
-            src - InputFile, File-ID или uri-изображения.
-
-    """
-    # InputFile can be provided via context vars
-    return MePhoto(photo=src, has_spoiler=has_spoiler)
-
-
-@register([MESSAGE])
-def animation(_, *, src: str, duration: int = None, width: int = None, height: int = None, thumbnail: str = None,
-              has_spoiler: bool = None) -> MeAnimation:
-    """
-        Анимация.
-
-        ::
-
-            │ <anim/>
-            └── MESSAGE Scope
-
-        Аргументы::
-
-            <anim src: (str|InputFile)[ duration: int][ width: int][ height: int][ thumbnail: InputFile]
-                [ has_spoiler: bool]/>
-            src - InputFile, File-ID или uri-анимации.
-
-    """
-    # InputFile can be provided via context vars
-    return MeAnimation(
-        animation=src,
-        duration=duration,
-        width=width,
-        height=height,
-        thumbnail=thumbnail,
-        has_spoiler=has_spoiler
-    )
-
-
-@register([MESSAGE])
-def video(_, *, src: str, duration: int = None, width: int = None, height: int = None, thumbnail: str = None,
-          has_spoiler: bool = None, supports_streaming: bool = None) -> MeVideo:
-    # InputFile can be provided via context vars
-    return MeVideo(
-        video=src,
-        duration=duration,
-        width=width,
-        height=height,
-        thumbnail=thumbnail,
-        has_spoiler=has_spoiler,
-        supports_streaming=supports_streaming
-    )
-
-
-@register([MESSAGE])
-def document(_, *, src: str, thumbnail: str = None, disable_content_type_detection: bool = None) -> MeDocument:
-    # InputFile can be provided via context vars
-    return MeDocument(
-        document=src,
-        thumbnail=thumbnail,
-        disable_content_type_detection=disable_content_type_detection
-    )
-
-
-@register([MESSAGE])
-def audio(_, *, src: str, duration: int = None, performer: str = None, title: str = None,
-          thumbnail: str = None) -> MeAudio:
-    # InputFile can be provided via context vars
-    return MeAudio(
-        audio=src,
-        duration=duration,
-        performer=performer,
-        title=title,
-        thumbnail=thumbnail
-    )
-
-
-@register([MESSAGE], name='inline-keyboard')
-def inline_keyboard(tag: Tag) -> InlineKeyboardMarkup:
-    """
-        Inline-клавиатура.
-
-        ::
-
-            │ <inline-keyboard>
-            │     ... INLINE_KEYBOARD ...
-            │ </inline-keyboard>
-            └── MESSAGE Scope
-
-    """
-    layout = INLINE_KEYBOARD.parse(tag.element, tag.context)
-    return InlineKeyboardMarkup(inline_keyboard=layout)
-
-
-@register([INLINE_KEYBOARD], name='row')
-def row_inline_keyboard(tag: Tag) -> KeyboardLayoutRow:
-    """
-        Строка inline-клавиатуры.
-
-        ::
-
-            │ <row>
-            │     ... INLINE_KEYBOARD_ROW ...
-            │ </row>
-            └── INLINE_KEYBOARD Scope
-
-    """
-    return INLINE_KEYBOARD_ROW.parse(tag.element, tag.context)
-
-
-@register([INLINE_KEYBOARD, INLINE_KEYBOARD_ROW], name='button')
-def button_inline_keyboard(tag: Tag, *, text: str = None, url: str = None, callback_data: str = None,
-                           web_app: WebAppInfo = None, login_url: LoginUrl = None,
-                           switch_inline_query: str = None, switch_inline_query_current_chat: str = None,
-                           callback_game: CallbackGame = None, pay: bool = False, cd: str = None) \
-        -> InlineKeyboardButton:
-    """
-        Кнопка inline-клавиатуры.
-
-        ::
-
-            │ <button>
-            │     ... NO_HTML ...
-            │ </button>
-            └── INLINE_KEYBOARD/INLINE_KEYBOARD_ROW Scope
-
-        Аргументы::
-
-            <button[ text: str][ url: str][ callback_data: str][ web_app: WebAppInfo][ login_url: LoginUrl]
-                [ switch_inline_query: str][ switch_inline_query_current_chat: str]
-                [ callback_game: CallbackGame][ pay: bool][ cd: str]/>
-
-            cd - сокращённый способ использовать "callback_data". Если указано и то и другое,
-            предпочтение отдаётся "callback_data".
-
-    """
-
-    if text is None:
-        text = NO_HTML.parse(tag.element, tag.context)
-
-    return InlineKeyboardButton(
-        text=text, url=url, callback_data=callback_data or cd, web_app=web_app, login_url=login_url,
-        switch_inline_query=switch_inline_query, switch_inline_query_current_chat=switch_inline_query_current_chat,
-        callback_game=callback_game, pay=pay
-    )
-
-
-@register([MESSAGE], name='reply-keyboard')
-def reply_keyboard(tag: Tag, *, resize_keyboard: bool = None, one_time_keyboard: bool = None,
-                   input_field_placeholder: str = None, selective: bool = None) -> ReplyKeyboardMarkup:
-    """
-        Reply-клавиатура.
-
-        ::
-
-            │ <reply-keyboard>
-            │     ... REPLY_KEYBOARD ...
-            │ </reply-keyboard>
-            └── MESSAGE Scope
-
-        Аргументы::
-
-            <reply-keyboard[ resize_keyboard: bool][ one_time_keyboard: bool][ input_field_placeholder: str]
-                [ selective: bool]/>
-
-    """
-
-    layout = REPLY_KEYBOARD.parse(tag.element, tag.context)
-    return ReplyKeyboardMarkup(
-        keyboard=layout, resize_keyboard=resize_keyboard, one_time_keyboard=one_time_keyboard,
-        input_field_placeholder=input_field_placeholder, selective=selective
-    )
-
-
-@register([REPLY_KEYBOARD], name='row')
-def row_reply_keyboard(tag: Tag) -> KeyboardLayoutRow:
-    """
-        Строка reply-клавиатуры.
-
-        ::
-
-            │ <row>
-            │     ... REPLY_KEYBOARD_ROW ...
-            │ </row>
-            └── REPLY_KEYBOARD Scope
-
-    """
-    return REPLY_KEYBOARD_ROW.parse(tag.element, tag.context)
-
-
-@register([REPLY_KEYBOARD, REPLY_KEYBOARD_ROW], name='button')
-def button_reply_keyboard(tag: Tag, *, text: str = None, request_contact: bool = None, request_location: bool = None,
-                          request_poll: KeyboardButtonPollType = None, web_app: WebAppInfo = None) -> KeyboardButton:
-    """
-        Кнопка reply-клавиатуры.
-
-        ::
-
-            │ <button>
-            │     ... NO_HTML ...
-            │ </button>
-            └── REPLY_KEYBOARD/REPLY_KEYBOARD_ROW Scope
-
-        Аргументы::
-
-            <button[ text: str][ request_contact: bool][ request_location: bool]
-                [ request_poll: KeyboardButtonPollType][ web_app: WebAppInfo]/>
-
-    """
-
-    if text is None:
-        text = NO_HTML.parse(tag.element, tag.context)
-
-    return KeyboardButton(
-        text=text, request_contact=request_contact, request_location=request_location, request_poll=request_poll,
-        web_app=web_app
-    )
@@ -1,160 +1,174 @@
-from typing import Generator, Union
+from typing import Any, TYPE_CHECKING, Union
 
-from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardButton, \
-    KeyboardButton
-
-from classes.message_editor import MeMessage, MeMediaType, MeLinkPreview, MePhoto, MeAnimation, MeVideo, MeDocument, \
-    MeAudio
 from template.dev import *
 from .types import *
 
+if TYPE_CHECKING:
+    from classes.message_editor import MeMessage, MeMediaType, MeAlbum
 
-def document_assembler() -> Generator[MeMessage, MeMessage, None]:
-    messages = None
-
-    while (token := (yield)) is not StopParsing:
-        if messages is not None:
-            raise ParsingCoroutineError('Got unexpected second token')
+# aiogram и модели сообщений импортируются только при получении первого
+# токена такого типа, чтобы импорт синтаксиса не загружал aiogram
+_MESSAGE_EDITOR = 'classes.message_editor'
+_AIOGRAM_TYPES = 'aiogram.types'
 
-        elif isinstance(token, MeMessage):
-            messages = token
-            continue
 
-        raise ParsingCoroutineError(f'Got unexpected token "{token}" (type: {token.__class__})')
+class DocumentAssembler(Assembler):
+    def __init__(self):
+        self.message = None
 
-    if messages is None:
-        raise ParsingCoroutineError('Got no tokens')
+    @accepts(f'{_MESSAGE_EDITOR}:MeMessage')
+    def add_message(self, token: 'MeMessage'):
+        if self.message is not None:
+            raise ParsingCoroutineError('Got unexpected second token')
+        self.message = token
 
-    yield messages
+    def result(self) -> 'MeMessage':
+        if self.message is None:
+            raise ParsingCoroutineError('Got no tokens')
+        return self.message
 
 
-DOCUMENT = ParsingScope(document_assembler)
+DOCUMENT = ParsingScope(DocumentAssembler)
 
 
-# noinspection DuplicatedCode
-def message_assembler() -> Generator[MeMessage,
-                                     Union[MeMediaType, Paragraph, Text,
-                                           InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove], None]:
-    media = None
-    text = ''
-    reply_markup = None
+class TextAssembler(Assembler):
+    def __init__(self):
+        self.layout = TextLayout()
 
-    layout = TextLayout()
+    @accepts(Section)
+    def add_section(self, token: Section):
+        self.layout.add_section(token)
 
-    while (token := (yield)) is not StopParsing:
+    @accepts(Paragraph)
+    def add_paragraph(self, token: Paragraph):
+        self.layout.add_paragraph(token)
 
-        if isinstance(token, (MeLinkPreview, MePhoto, MeAnimation, MeVideo, MeDocument, MeAudio)):
-            if media is not None:
-                raise ParsingCoroutineError('Message cannot have more than one media attached')
-            media = token
-            continue
+    @accepts(Text, str)
+    def add_text(self, token: Union[Text, str]):
+        self.layout.add_word(token)
 
-        if isinstance(token, Section):
-            layout.add_section(token)
-            continue
+    def result(self) -> str:
+        return self.layout.close()
 
-        if isinstance(token, Paragraph):
-            layout.add_paragraph(token)
-            continue
 
-        if isinstance(token, (Text, str)):
-            layout.add_word(token)
-            continue
+ELEMENT = ParsingScope(TextAssembler)
+NO_HTML = ParsingScope(TextAssembler)
+PLAIN_TEXT = ParsingScope(TextAssembler)  # Текст вне HTML, например, подписи кнопок
 
-        if isinstance(token, (InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove)):
-            if reply_markup is not None:
-                raise ParsingCoroutineError('Message can only have one keyboard')
-            reply_markup = token
-            continue
 
-        raise ParsingCoroutineError(f'Got unexpected token "{token}" (type: {token.__class__})')
+class MessageAssembler(TextAssembler):
+    def __init__(self):
+        super().__init__()
+        self.media = None
+        self.reply_markup = None
 
-    text = layout.close()
-    yield MeMessage(
-        media=media,
-        text=text,
-        entities=None,
-        parse_mode='HTML',
-        reply_markup=reply_markup
-    )
+    @accepts(*(f'{_MESSAGE_EDITOR}:{name}'
+               for name in ('MeLinkPreview', 'MePhoto', 'MeAnimation', 'MeVideo', 'MeDocument', 'MeAudio', 'MeAlbum')))
+    def add_media(self, token: 'MeMediaType'):
+        if self.media is not None:
+            raise ParsingCoroutineError('Message cannot have more than one media attached')
+        self.media = token
 
+    @accepts(*(f'{_AIOGRAM_TYPES}:{name}'
+               for name in ('InlineKeyboardMarkup', 'ReplyKeyboardMarkup', 'ReplyKeyboardRemove')))
+    def add_keyboard(self, token: Any):
+        if self.reply_markup is not None:
+            raise ParsingCoroutineError('Message can only have one keyboard')
+        self.reply_markup = token
 
-MESSAGE = ParsingScope(message_assembler)
+    def result(self) -> 'MeMessage':
+        message_editor = lazy_import(_MESSAGE_EDITOR)
 
+        if isinstance(self.media, message_editor.MeAlbum) and self.reply_markup is not None:
+            raise ParsingCoroutineError('Album cannot have a keyboard')
 
-# noinspection DuplicatedCode
-def text_assembler() -> Generator[str, Union[Paragraph, Text], None]:
-    layout = TextLayout()
+        return construct(
+            message_editor.MeMessage,
+            media=self.media,
+            text=super().result(),
+            entities=None,
+            parse_mode='HTML',
+            reply_markup=self.reply_markup
+        )
 
-    while (token := (yield)) is not StopParsing:
 
-        if isinstance(token, Section):
-            layout.add_section(token)
-            continue
+MESSAGE = ParsingScope(MessageAssembler)
 
-        if isinstance(token, Paragraph):
-            layout.add_paragraph(token)
-            continue
 
-        if isinstance(token, (Text, str)):
-            layout.add_word(token)
-            continue
+class AlbumAssembler(Assembler):
+    MIN_ITEMS = 2
+    MAX_ITEMS = 10
 
-        raise ParsingCoroutineError(f'Got unexpected token "{token}" (type: {token.__class__})')
+    def __init__(self):
+        self.items = []
 
-    yield layout.close()
+    @accepts(*(f'{_MESSAGE_EDITOR}:{name}' for name in ('MePhoto', 'MeVideo', 'MeDocument', 'MeAudio')))
+    def add_item(self, token: Any):
+        message_editor = lazy_import(_MESSAGE_EDITOR)
+        single = message_editor.MeDocument, message_editor.MeAudio
 
+        # Фото и видео можно смешивать, документы и аудио - только с себе подобными
+        if self.items and (type(token) in single or type(self.items[0]) in single) \
+                and type(token) is not type(self.items[0]):
+            raise ParsingCoroutineError('Documents and audio can only be grouped with the same type')
 
-ELEMENT = ParsingScope(text_assembler)
-NO_HTML = ParsingScope(text_assembler)
+        if len(self.items) == self.MAX_ITEMS:
+            raise ParsingCoroutineError(f'Album cannot have more than {self.MAX_ITEMS} items')
 
+        self.items.append(token)
 
-def keyboard_assembler() -> Generator[Union[list[list[InlineKeyboardButton]], list[list[KeyboardButton]]],
-                                      Union[InlineKeyboardButton, KeyboardButton], None]:
-    layout = KeyboardLayout()
+    def result(self) -> 'MeAlbum':
+        if len(self.items) < self.MIN_ITEMS:
+            raise ParsingCoroutineError(f'Album must have at least {self.MIN_ITEMS} items')
+        return construct(lazy_import(f'{_MESSAGE_EDITOR}:MeAlbum'), items=self.items)
 
-    while (token := (yield)) is not StopParsing:
 
-        if isinstance(token, KeyboardLayoutRow):
-            layout.add_row(token)
-            continue
+ALBUM = ParsingScope(AlbumAssembler)
 
-        if isinstance(token, (InlineKeyboardButton, KeyboardButton)):
-            layout.add(token)
-            continue
 
-        raise ParsingCoroutineError(f'Got unexpected token "{token}" (type: {token.__class__})')
+class KeyboardAssembler(Assembler):
+    def __init__(self):
+        self.layout = KeyboardLayout()
 
-    yield layout.result()
+    @accepts(KeyboardLayoutRow)
+    def add_row(self, token: KeyboardLayoutRow):
+        self.layout.add_row(token)
 
+    @accepts(f'{_AIOGRAM_TYPES}:InlineKeyboardButton', f'{_AIOGRAM_TYPES}:KeyboardButton')
+    def add_button(self, token: Any):
+        self.layout.add(token)
 
-INLINE_KEYBOARD = ParsingScope(keyboard_assembler)
-REPLY_KEYBOARD = ParsingScope(keyboard_assembler)
+    def result(self) -> list[list]:
+        return self.layout.result()
 
 
-def keyboard_row_assembler() -> Generator[KeyboardLayoutRow, Union[InlineKeyboardButton, KeyboardButton], None]:
-    buttons = KeyboardLayoutRow()
+INLINE_KEYBOARD = ParsingScope(KeyboardAssembler)
+REPLY_KEYBOARD = ParsingScope(KeyboardAssembler)
 
-    while (token := (yield)) is not StopParsing:
 
-        if isinstance(token, (InlineKeyboardButton, KeyboardButton)):
-            buttons.append(token)
-            continue
+class KeyboardRowAssembler(Assembler):
+    def __init__(self):
+        self.buttons = KeyboardLayoutRow()
 
-        raise ParsingCoroutineError(f'Got unexpected token "{token}" (type: {token.__class__})')
+    @accepts(f'{_AIOGRAM_TYPES}:InlineKeyboardButton', f'{_AIOGRAM_TYPES}:KeyboardButton')
+    def add_button(self, token: Any):
+        self.buttons.append(token)
 
-    yield buttons
+    def result(self) -> KeyboardLayoutRow:
+        return self.buttons
 
 
-INLINE_KEYBOARD_ROW = ParsingScope(keyboard_row_assembler)
-REPLY_KEYBOARD_ROW = ParsingScope(keyboard_row_assembler)
+INLINE_KEYBOARD_ROW = ParsingScope(KeyboardRowAssembler)
+REPLY_KEYBOARD_ROW = ParsingScope(KeyboardRowAssembler)
 
 
 __all__ = (
     'DOCUMENT',
     'MESSAGE',
+    'ALBUM',
     'ELEMENT',
     'NO_HTML',
+    'PLAIN_TEXT',
     'INLINE_KEYBOARD',
     'REPLY_KEYBOARD',
     'INLINE_KEYBOARD_ROW',
@@ -1,9 +1,91 @@
+import itertools
 import typing
 from typing import TypeVar
 
-from aiogram.types import InputFile
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
 
 T = TypeVar('T')
+M = TypeVar('M', bound=BaseModel)
+
+if typing.TYPE_CHECKING:
+    from aiogram.types import InputFile
+
+_trusted_construction = False
+
+
+def set_trusted_construction(trusted: bool):
+    """
+    Включает или выключает доверенное создание моделей. В доверенном режиме
+    модели, создаваемые обработчиками тегов (MeMessage, MePhoto, клавиатуры
+    и кнопки), не проходят валидацию pydantic, т.к. обработчики сами
+    гарантируют корректность значений. По умолчанию выключено, чтобы
+    ошибки в обработчиках обнаруживались, например, в тестах.
+    """
+    global _trusted_construction
+    _trusted_construction = trusted
+
+
+def get_trusted_construction() -> bool:
+    """ Возвращает, включено ли доверенное создание моделей """
+    return _trusted_construction
+
+
+def _compile_builder(model: type[M]) -> typing.Callable[..., M]:
+    """
+    Создаёт функцию, собирающую модель без валидации. В отличие от
+    model_construct, значения по умолчанию, приватные атрибуты и extra
+    вычисляются один раз для модели, а не при каждом создании объекта.
+    """
+    if any(field.default_factory is not None for field in model.model_fields.values()):
+        return model.model_construct
+
+    # Обязательные поля тоже включаются, чтобы сохранить порядок полей
+    defaults = {
+        name: field.get_default() if not field.is_required() else PydanticUndefined
+        for name, field in model.model_fields.items()
+    }
+    private = {
+        name: attribute.get_default()
+        for name, attribute in (model.__private_attributes__ or {}).items()
+        if attribute.get_default() is not PydanticUndefined
+    } or None
+    extra = {} if model.model_config.get('extra') == 'allow' else None
+    post_init = model.__pydantic_post_init__ is not None
+
+    new = object.__new__
+    set_attribute = object.__setattr__
+
+    def build(**fields) -> M:
+        values = defaults.copy()
+        values.update(fields)
+
+        instance = new(model)
+        set_attribute(instance, '__dict__', values)
+        set_attribute(instance, '__pydantic_fields_set__', set(fields))
+        set_attribute(instance, '__pydantic_extra__', None if extra is None else {})
+        set_attribute(instance, '__pydantic_private__', None if private is None else private.copy())
+        if post_init:
+            instance.model_post_init(None)
+        return instance
+
+    return build
+
+
+_builders: dict[type, typing.Callable] = {}
+
+
+def construct(model: type[M], **fields) -> M:
+    """ Создаёт модель, пропуская валидацию в доверенном режиме """
+    if not _trusted_construction:
+        return model(**fields)
+
+    try:
+        builder = _builders[model]
+    except KeyError:
+        builder = _builders[model] = _compile_builder(model)
+
+    return builder(**fields)
 
 
 class TextLayout:
@@ -80,6 +162,8 @@ def _sub_type(name: str, tp: T) -> T:
 
 
 Text = _sub_type('Text', str)
+Safe = _sub_type('Safe', str)
+""" Строка, которая не экранируется при подстановке в текст шаблона """
 Paragraph = _sub_type('Paragraph', str)
 Section = _sub_type('Section', str)
 
@@ -90,17 +174,60 @@ AnimationID = _sub_type('AnimationID', str)
 
 
 class ImageFile(typing.NamedTuple):
-    input_file: InputFile
+    input_file: 'InputFile'
 
 
 class AnimationFile(typing.NamedTuple):
-    input_file: InputFile
+    input_file: 'InputFile'
+
+
+class Page(typing.NamedTuple):
+    """ Видимая часть списка для <paged-keyboard> """
+    items: list
+    number: int
+    has_next: bool
+
+
+def take_page(source: typing.Iterable, number: int, size: int) -> Page:
+    """ Берёт из источника только элементы страницы и ещё один, чтобы
+        узнать, есть ли следующая страница. Последовательности срезаются
+        напрямую, остальные источники перебираются лениво """
+    start = number * size
+
+    if isinstance(source, typing.Sequence):
+        items = list(source[start:start + size + 1])
+    else:
+        items = list(itertools.islice(source, start, start + size + 1))
+
+    return Page(items[:size], number, len(items) > size)
+
+
+async def fetch_page(source: typing.AsyncIterable, number: int, size: int) -> Page:
+    """ То же, что и take_page, но для асинхронных источников. Render
+        синхронный, поэтому страница загружается заранее и передаётся
+        в шаблон вместо источника """
+    start = number * size
+    items = []
+    index = 0
+
+    async for item in source:
+        if index >= start:
+            items.append(item)
+            if len(items) > size:
+                break
+        index += 1
+
+    return Page(items[:size], number, len(items) > size)
 
 
 __all__ = (
+    'set_trusted_construction',
+    'get_trusted_construction',
+    'construct',
     'TextLayout',
     'KeyboardLayout',
     'Text',
+    'Safe',
     'Paragraph',
     'Section',
     'KeyboardLayoutRow',
@@ -108,4 +235,7 @@ __all__ = (
     'AnimationID',
     'ImageFile',
     'AnimationFile',
+    'Page',
+    'take_page',
+    'fetch_page',
 )
@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+
+from hulio.core.classes.callback_codec import CallbackCodec, MAX_CALLBACK_DATA
+from hulio.core.classes.component_registry import ComponentRegistry
+
+
+def _registry(*actions: tuple[str, str]) -> ComponentRegistry:
+    registry = ComponentRegistry()
+    for component_id, action_id in actions:
+        registry.register_action(component_id, action_id)
+    return registry
+
+
+@pytest.fixture
+def codec():
+    return CallbackCodec(_registry(('Menu', 'open'), ('Menu', 'close'), ('Cart', 'add')))
+
+
+def test_round_trip(codec):
+    record_id = uuid.uuid4()
+    data = codec.encode(record_id, 'Cart', 'add', 42, 'green')
+
+    assert len(data) <= MAX_CALLBACK_DATA
+    decoded = codec.decode(data)
+    assert decoded.record_id == record_id
+    assert (decoded.component_id, decoded.action_id) == ('Cart', 'add')
+    assert decoded.args == ('42', 'green')
+
+
+def test_oversized_args_are_spilled(codec):
+    record_id = uuid.uuid4()
+    data = codec.encode(record_id, 'Menu', 'open', 'x' * 200)
+
+    assert len(data) <= MAX_CALLBACK_DATA
+    assert codec.decode(data).args == ('x' * 200,)
+
+
+def test_rerendered_button_reuses_spilled_entry(codec):
+    record_id = uuid.uuid4()
+    first = codec.encode(record_id, 'Menu', 'open', 'x' * 200)
+
+    assert codec.encode(record_id, 'Menu', 'open', 'x' * 200) == first
+    assert len(codec._spilled) == 1
+
+
+def test_spilled_entries_are_evicted_least_recently_used():
+    codec = CallbackCodec(_registry(('Menu', 'open')), spill_size=2)
+    record_id = uuid.uuid4()
+
+    shown = codec.encode(record_id, 'Menu', 'open', 'a' * 200)
+    other = codec.encode(record_id, 'Menu', 'open', 'b' * 200)
+    codec.decode(shown)
+    codec.encode(record_id, 'Menu', 'open', 'c' * 200)
+
+    assert codec.decode(shown).args == ('a' * 200,)
+    assert codec.decode(other) is None
+
+
+@pytest.mark.parametrize('data', [None, '', 'other:data', 'h:', 'h:!!!', 'h:AAAA'])
+def test_foreign_and_malformed_data_is_rejected(codec, data):
+    assert codec.decode(data) is None
+
+
+def test_action_indexes_do_not_depend_on_registration_order():
+    record_id = uuid.uuid4()
+    old = CallbackCodec(_registry(('Menu', 'open'), ('Cart', 'add')))
+    data = old.encode(record_id, 'Cart', 'add')
+
+    # После деплоя добавился компонент, порядок регистрации изменился
+    new = CallbackCodec(_registry(('Search', 'find'), ('Cart', 'add'), ('Menu', 'open')))
+    decoded = new.decode(data)
+    assert (decoded.component_id, decoded.action_id) == ('Cart', 'add')
+
+
+def test_unknown_action_is_rejected(codec):
+    other = CallbackCodec(_registry(('Removed', 'action')))
+    assert codec.decode(other.encode(uuid.uuid4(), 'Removed', 'action')) is None
@@ -0,0 +1,146 @@
+import asyncio
+import datetime
+import uuid
+
+import pytest
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from hulio.core.classes.callback_codec import CallbackCodec
+from hulio.core.classes.component import Component
+from hulio.core.classes.component_cache import ComponentCache
+from hulio.core.classes.component_registry import ComponentRegistry
+from hulio.core.classes.database_controller import DatabaseController
+from hulio.core.classes.lock_manager import LockManager
+from hulio.core.contexts import current_chat
+from hulio.core.handlers.component_handler_decorator import component_handler_decorator
+from hulio.core.handlers.callback_dispatcher import CallbackDispatcher
+from hulio.core.interfaces.database import ComponentRecord
+from hulio.core.providers.memory import MemoryStorageProvider
+
+
+async def handler(query: CallbackQuery, **kwargs):
+    return kwargs
+
+
+@pytest.fixture
+def storage():
+    storage = DatabaseController(MemoryStorageProvider())
+    storage.setup()
+    return storage
+
+
+@pytest.fixture
+def codec():
+    registry = ComponentRegistry()
+    registry.register_action('Menu', 'open')
+    registry.register_action('Cart', 'add')
+    return CallbackCodec(registry)
+
+
+def _track(storage, component_id: str) -> uuid.UUID:
+    record_id = uuid.uuid4()
+    storage.component_track(ComponentRecord(
+        record_id=record_id, parent_record_id=None, message_record_id=uuid.uuid4(),
+        component_id=component_id, state_json='{}', is_enabled=True
+    ))
+    return record_id
+
+
+CHAT = Chat(id=1, type='private')
+
+
+def _query(data: str) -> CallbackQuery:
+    return CallbackQuery(
+        id='1', from_user=User(id=1, is_bot=False, first_name='User'), chat_instance='1', data=data,
+        message=Message(message_id=1, date=datetime.datetime.now(), chat=CHAT)
+    )
+
+
+def _filter(dispatcher: CallbackDispatcher, data: str, **kwargs):
+    return asyncio.run(dispatcher.filter(_query(data), **kwargs))
+
+
+def test_tracked_component_button_passes(storage, codec):
+    dispatcher = CallbackDispatcher(codec, storage)
+    dispatcher.add('Menu', 'open', handler)
+    record_id = _track(storage, 'Menu')
+
+    result = _filter(dispatcher, codec.encode(record_id, 'Menu', 'open', 7))
+
+    assert result['component_record_id'] == record_id
+    assert result['args'] == ['7']
+    assert result['component_handler'] is handler
+
+
+def test_untracked_or_forged_record_is_rejected(storage, codec):
+    dispatcher = CallbackDispatcher(codec, storage)
+    dispatcher.add('Menu', 'open', handler)
+
+    assert _filter(dispatcher, codec.encode(uuid.uuid4(), 'Menu', 'open')) is False
+
+
+def test_record_of_another_component_is_rejected(storage, codec):
+    dispatcher = CallbackDispatcher(codec, storage)
+    dispatcher.add('Menu', 'open', handler)
+    record_id = _track(storage, 'Cart')
+
+    assert _filter(dispatcher, codec.encode(record_id, 'Menu', 'open')) is False
+
+
+def test_filter_may_override_existing_keys(storage, codec):
+    def user_filter(query: CallbackQuery, event_from_user: User, args: list):
+        return {'event_from_user': None, 'args': args + ['extra']}
+
+    dispatcher = CallbackDispatcher(codec, storage)
+    dispatcher.add('Menu', 'open', handler, [user_filter])
+    record_id = _track(storage, 'Menu')
+
+    result = _filter(dispatcher, codec.encode(record_id, 'Menu', 'open'), event_from_user=User(
+        id=1, is_bot=False, first_name='User'
+    ))
+
+    assert result['event_from_user'] is None
+    assert result['args'] == ['extra']
+
+
+class Switch(Component, template='switch.xml'):
+    value: str = ''
+    chat_id: int = 0
+
+    async def set_value(self, args: list):
+        self.value = args[0]
+        self.chat_id = current_chat.get().id
+
+
+def test_button_click_runs_component_handler():
+    registry = ComponentRegistry()
+    registry.register(Switch.get_component_id(), Switch)
+    registry.register_action(Switch.get_component_id(), 'set_value')
+    codec = CallbackCodec(registry)
+
+    controller = DatabaseController(MemoryStorageProvider())
+    controller.setup()
+    storage = ComponentCache(controller)
+
+    dispatcher = CallbackDispatcher(codec, storage)
+    dispatcher.add(Switch.get_component_id(), 'set_value', component_handler_decorator(
+        Switch.set_value, Switch.get_component_id(), storage, registry, LockManager()
+    ))
+    switch = Switch()
+    switch.record_id = record_id = uuid.uuid4()
+    switch.bot_id = 1
+    storage.component_track(ComponentRecord(
+        record_id=record_id, parent_record_id=None, message_record_id=uuid.uuid4(),
+        component_id=Switch.get_component_id(), state_json=switch.model_dump_json(), is_enabled=True
+    ))
+
+    async def click():
+        query = _query(codec.encode(record_id, Switch.get_component_id(), 'set_value', 'on'))
+        result = await dispatcher.filter(query, bots=[])
+        await dispatcher.handle(query, bots=[], **result)
+
+    asyncio.run(click())
+
+    stored = Switch.model_validate_json(controller.component_get(record_id).state_json)
+    assert stored.value == 'on'
+    assert stored.chat_id == CHAT.id
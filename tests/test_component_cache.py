@@ -0,0 +1,192 @@
+import asyncio
+import datetime
+import uuid
+
+import pytest
+from aiogram.types import Chat, Message
+
+from hulio.core.classes.component import Component
+from hulio.core.classes.component_cache import ComponentCache
+from hulio.core.classes.component_registry import ComponentRegistry
+from hulio.core.classes.database_controller import DatabaseController
+from hulio.core.classes.lock_manager import LockManager
+from hulio.core.classes.storage_lookup import StorageLookup
+from hulio.core.handlers.component_handler_decorator import component_handler_decorator
+from hulio.core.interfaces.database import ComponentRecord, MessageRecord
+from hulio.core.providers.memory import MemoryStorageProvider
+
+
+class Counter(Component, template='counter.xml'):
+    count: int = 0
+    history: list[int] = []
+
+    async def increase(self):
+        self.count += 1
+
+    async def remember(self):
+        self.history.append(self.count)
+
+    async def nothing(self):
+        pass
+
+    async def fail(self):
+        self.count += 100
+        raise RuntimeError('Handler failed')
+
+
+MESSAGE = Message(message_id=1, date=datetime.datetime.now(), chat=Chat(id=1, type='private'))
+
+
+@pytest.fixture
+def registry():
+    registry = ComponentRegistry()
+    registry.register(Counter.get_component_id(), Counter)
+    return registry
+
+
+@pytest.fixture
+def controller():
+    controller = DatabaseController(MemoryStorageProvider())
+    controller.setup()
+    return controller
+
+
+@pytest.fixture
+def storage(controller):
+    return ComponentCache(controller)
+
+
+@pytest.fixture
+def component(storage):
+    message = MessageRecord(
+        record_id=uuid.uuid4(), bot_id=1, chat_id=1, user_id=1, message_id=1, media_id='', media_type='nm'
+    )
+    storage.message_track(message)
+
+    component = Counter()
+    component.record_id = uuid.uuid4()
+    component.message_record_id = message.record_id
+    component.bot_id = 1
+
+    state = component.model_dump_json()
+    storage.component_track(ComponentRecord(
+        record_id=component.record_id,
+        parent_record_id=None,
+        message_record_id=message.record_id,
+        component_id=Counter.get_component_id(),
+        state_json=state,
+        is_enabled=True
+    ))
+    component.mark_stored(state)
+    return component
+
+
+def _call(handler, storage, registry, record_id: uuid.UUID, **kwargs):
+    decorated = component_handler_decorator(handler, Counter.get_component_id(), storage, registry, LockManager())
+    asyncio.run(decorated(MESSAGE, record_id, bots=[], **kwargs))
+
+
+def _stored(controller, record_id: uuid.UUID) -> Counter:
+    return Counter.model_validate_json(controller.component_get(record_id).state_json)
+
+
+def _stored_count(controller, record_id: uuid.UUID) -> int:
+    return _stored(controller, record_id).count
+
+
+def test_handler_changes_are_saved(storage, registry, controller, component):
+    _call(Counter.increase, storage, registry, component.record_id)
+    _call(Counter.increase, storage, registry, component.record_id)
+
+    assert _stored_count(controller, component.record_id) == 2
+
+
+def test_failed_handler_leaves_no_partial_state_in_cache(storage, registry, controller, component):
+    _call(Counter.increase, storage, registry, component.record_id)
+
+    with pytest.raises(RuntimeError):
+        _call(Counter.fail, storage, registry, component.record_id)
+
+    assert storage.get(component.record_id) is None
+
+    _call(Counter.increase, storage, registry, component.record_id)
+    assert _stored_count(controller, component.record_id) == 2
+
+
+class Other(Component, template='other.xml'):
+    async def touch(self):
+        raise AssertionError('Handler of another component must not be called')
+
+
+def test_stale_record_id_is_ignored(storage, registry):
+    _call(Counter.increase, storage, registry, uuid.uuid4())
+
+
+def test_record_of_another_component_is_ignored(storage, registry, controller, component):
+    decorated = component_handler_decorator(Other.touch, Other.get_component_id(), storage, registry, LockManager())
+    asyncio.run(decorated(MESSAGE, component.record_id, bots=[]))
+
+    # Как из хранилища, так и из кеша
+    _call(Counter.increase, storage, registry, component.record_id)
+    asyncio.run(decorated(MESSAGE, component.record_id, bots=[]))
+
+    assert _stored_count(controller, component.record_id) == 1
+
+
+def test_failed_write_is_retried(storage, controller, component, monkeypatch):
+    def fail(*args, **kwargs):
+        raise ConnectionError('Storage is unavailable')
+
+    component.count = 5
+    with monkeypatch.context() as patch:
+        patch.setattr(controller, 'component_patch', fail)
+        with pytest.raises(ConnectionError):
+            storage.save(component)
+
+    assert _stored_count(controller, component.record_id) == 0
+
+    storage.save(component)
+    assert _stored_count(controller, component.record_id) == 5
+    assert storage.metrics['writes'] == 1
+
+    storage.save(component)
+    assert storage.metrics['skipped_writes'] == 1
+
+
+def test_in_place_mutation_is_saved(storage, registry, controller, component):
+    _call(Counter.increase, storage, registry, component.record_id)
+    _call(Counter.remember, storage, registry, component.record_id)
+
+    assert _stored(controller, component.record_id).history == [1]
+
+
+def test_unchanged_component_is_not_written(storage, registry, component):
+    _call(Counter.nothing, storage, registry, component.record_id)
+
+    assert storage.metrics['writes'] == 0
+    assert storage.metrics['skipped_writes'] == 1
+
+
+def test_record_read_by_filter_is_not_used_after_lock(storage, registry, controller, component):
+    # Фильтр прочитал запись, затем другой обработчик изменил компонент,
+    # а объект вытеснен из кеша
+    lookup = StorageLookup(storage)
+    lookup.component_get(component.record_id)
+
+    _call(Counter.increase, storage, registry, component.record_id)
+    storage.invalidate(component.record_id)
+
+    _call(Counter.increase, storage, registry, component.record_id, storage_lookup=lookup)
+    assert _stored_count(controller, component.record_id) == 2
+
+
+def test_only_changed_fields_are_patched(storage, controller, component, monkeypatch):
+    patches = []
+    patch_json = controller.provider.patch_json
+    monkeypatch.setattr(controller.provider, 'patch_json', lambda *args: patches.append(args[3]) or patch_json(*args))
+
+    component.history.append(1)
+    storage.save(component)
+
+    assert patches == [{'history': [1]}]
+    assert _stored(controller, component.record_id).history == [1]
@@ -0,0 +1,78 @@
+import asyncio
+import datetime
+import uuid
+
+import pytest
+from aiogram import Bot
+from aiogram.types import Chat, Message, User
+
+from hulio.core.classes.database_controller import DatabaseController
+from hulio.core.filters.is_component_focused import is_component_focused
+from hulio.core.interfaces.database import ComponentRecord, MessageRecord
+from hulio.core.providers.memory import MemoryStorageProvider
+
+BOT_ID, CHAT_ID, USER_ID = 42, 1, 1
+
+
+@pytest.fixture
+def storage():
+    storage = DatabaseController(MemoryStorageProvider())
+    storage.setup()
+    return storage
+
+
+def _send(storage, component_id: str) -> uuid.UUID:
+    """ Отправляет сообщение с одним компонентом """
+    message = MessageRecord(
+        record_id=uuid.uuid4(), bot_id=BOT_ID, chat_id=CHAT_ID, user_id=USER_ID,
+        message_id=1, media_id='', media_type='nm'
+    )
+    storage.message_track(message)
+
+    record_id = uuid.uuid4()
+    storage.component_track(ComponentRecord(
+        record_id=record_id, parent_record_id=None, message_record_id=message.record_id,
+        component_id=component_id, state_json='{}', is_enabled=True
+    ))
+    return record_id
+
+
+def _text_reaches(storage, component_id: str) -> bool:
+    message = Message(
+        message_id=2, date=datetime.datetime.now(), chat=Chat(id=CHAT_ID, type='private'),
+        from_user=User(id=USER_ID, is_bot=False, first_name='User'), text='hello'
+    ).as_(Bot(f'{BOT_ID}:TOKEN'))
+    return bool(asyncio.run(is_component_focused(component_id, storage)(message)))
+
+
+def _open_child(storage, parent: uuid.UUID) -> uuid.UUID:
+    storage.component_patch(parent, {'is_enabled': False})
+    return _send(storage, 'Child')
+
+
+@pytest.mark.parametrize('enable_first', [False, True])
+def test_parent_receives_text_after_child_closes(storage, enable_first):
+    parent = _send(storage, 'Parent')
+    child = _open_child(storage, parent)
+    assert _text_reaches(storage, 'Child')
+
+    if enable_first:
+        storage.component_patch(parent, {'is_enabled': True})
+        storage.component_untrack(child)
+    else:
+        storage.component_untrack(child)
+        storage.component_patch(parent, {'is_enabled': True})
+
+    assert storage.component_get_focused(BOT_ID, CHAT_ID, USER_ID).record_id == parent
+    assert _text_reaches(storage, 'Parent')
+
+
+def test_focus_falls_back_to_latest_message(storage):
+    first = _send(storage, 'First')
+    second = _send(storage, 'Second')
+
+    storage.component_untrack(second)
+    assert storage.component_get_focused(BOT_ID, CHAT_ID, USER_ID).record_id == first
+
+    storage.component_patch(first, {'is_enabled': False})
+    assert storage.component_get_focused(BOT_ID, CHAT_ID, USER_ID) is None
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from hulio.core.classes.lock_manager import LockManager
+
+
+async def _hold(locks: LockManager, key, name: str, order: list, started: asyncio.Event = None):
+    async with locks.lock(key) as waited:
+        order.append((name, waited))
+        if started is not None:
+            started.set()
+        await asyncio.sleep(0)
+
+
+def test_waiters_acquire_in_arrival_order():
+    async def main():
+        locks = LockManager()
+        order = []
+
+        await locks.acquire('record')
+        tasks = []
+        for name in 'abc':
+            tasks.append(asyncio.create_task(_hold(locks, 'record', name, order)))
+            await asyncio.sleep(0)
+
+        assert locks.queue_length('record') == 3
+        locks.release('record')
+        await asyncio.gather(*tasks)
+
+        assert order == [('a', True), ('b', True), ('c', True)]
+        assert locks.active_keys == 0
+        assert locks.peak_queue_length == 3
+
+    asyncio.run(main())
+
+
+def test_new_task_does_not_overtake_waiter():
+    async def main():
+        locks = LockManager()
+        order = []
+
+        await locks.acquire('record')
+        waiter = asyncio.create_task(_hold(locks, 'record', 'waiter', order))
+        await asyncio.sleep(0)
+
+        # Блокировка передаётся ожидающему при освобождении, поэтому
+        # пришедший позже её не перехватывает
+        locks.release('record')
+        late = asyncio.create_task(_hold(locks, 'record', 'late', order))
+        await asyncio.gather(waiter, late)
+
+        assert order == [('waiter', True), ('late', True)]
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_is_skipped():
+    async def main():
+        locks = LockManager()
+        order = []
+
+        await locks.acquire('record')
+        cancelled = asyncio.create_task(_hold(locks, 'record', 'cancelled', order))
+        waiter = asyncio.create_task(_hold(locks, 'record', 'waiter', order))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        locks.release('record')
+        await waiter
+
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert order == [('waiter', True)]
+        assert locks.active_keys == 0
+
+    asyncio.run(main())
+
+
+def test_different_keys_do_not_block():
+    async def main():
+        locks = LockManager()
+        order = []
+
+        await locks.acquire('first')
+        await _hold(locks, 'second', 'second', order)
+        locks.release('first')
+
+        assert order == [('second', False)]
+
+    asyncio.run(main())
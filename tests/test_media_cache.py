@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+import pytest
+
+from classes import media_cache
+from classes.media_cache import MediaCache
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(b'photo')
+    return str(path)
+
+
+def _touch(path: str):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_lookup_does_not_read_file(photo, monkeypatch):
+    cache = MediaCache()
+    cache.set(photo, 'file-id')
+
+    monkeypatch.setattr(media_cache, '_file_hash', None)
+    assert cache.get(photo) == 'file-id'
+
+
+def test_file_ids_survive_restart(photo, tmp_path):
+    path = str(tmp_path / 'media.json')
+    MediaCache(path).set(photo, 'file-id')
+
+    assert MediaCache(path).get(photo) == 'file-id'
+
+
+def test_touched_file_is_revalidated_by_hash(photo):
+    cache = MediaCache()
+    cache.set(photo, 'file-id')
+    asyncio.run(cache.revalidate(photo))
+
+    _touch(photo)
+    assert cache.get(photo) is None
+
+    assert asyncio.run(cache.revalidate(photo)) == 'file-id'
+    assert cache.get(photo) == 'file-id'
+
+
+def test_changed_file_is_uploaded_again(photo):
+    cache = MediaCache()
+    cache.set(photo, 'file-id')
+    asyncio.run(cache.revalidate(photo))
+
+    with open(photo, 'wb') as file:
+        file.write(b'another photo')
+    _touch(photo)
+
+    assert asyncio.run(cache.revalidate(photo)) is None
+    assert cache.get(photo) is None
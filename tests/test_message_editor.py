@@ -0,0 +1,107 @@
+import asyncio
+import datetime
+
+import pytest
+from aiogram.types import Chat, InlineKeyboardButton, InlineKeyboardMarkup, Message, PhotoSize, FSInputFile
+
+import classes.message_editor as me
+from classes import media_cache
+from classes.media_cache import MediaCache, resolve_media
+
+FILE_ID = 'AgACAgIAAxkBAAIB'
+
+
+class FakeBot:
+    """ Записывает вызванные методы и отвечает сообщением с фото """
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name: str):
+        async def method(**kwargs):
+            self.calls.append(name)
+            return Message(
+                message_id=1,
+                date=datetime.datetime.now(),
+                chat=Chat(id=1, type='private'),
+                photo=[PhotoSize(file_id=FILE_ID, file_unique_id='u', width=1, height=1)]
+            )
+
+        return method
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    fake = FakeBot()
+    monkeypatch.setattr(me, 'bot', fake)
+    monkeypatch.setattr(media_cache, 'media_cache', MediaCache())
+    return fake
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / 'photo.png'
+    path.write_bytes(b'not really a png')
+    return str(path)
+
+
+def _keyboard(text: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=text, callback_data='x')]])
+
+
+def _message(photo: str, caption: str = 'caption', button: str = 'A') -> me.MeMessage:
+    """ Как после render-а: путь к файлу проходит через resolve_media """
+    return me.MeMessage(
+        media=me.MePhoto(photo=resolve_media(photo), has_spoiler=None),
+        text=caption,
+        entities=None,
+        parse_mode=None,
+        reply_markup=_keyboard(button)
+    )
+
+
+def test_unchanged_render_after_upload_is_skipped(bot, photo):
+    editor = me.MessageEditor()
+    first = _message(photo)
+    assert isinstance(first.media.photo, FSInputFile)
+
+    asyncio.run(editor.send(first, chat_id=1))
+
+    # Файл загружен, следующий render подставляет file_id
+    second = _message(photo)
+    assert second.media.photo == FILE_ID
+
+    assert asyncio.run(editor.edit(second)) is False
+    assert bot.calls == ['send_photo']
+
+
+def test_keyboard_change_after_upload_edits_only_markup(bot, photo):
+    editor = me.MessageEditor()
+    asyncio.run(editor.send(_message(photo), chat_id=1))
+
+    asyncio.run(editor.edit(_message(photo, button='B')))
+
+    assert bot.calls == ['send_photo', 'edit_message_reply_markup']
+    assert editor.last_edit_method == 'reply_markup'
+
+
+def test_caption_change_after_upload_edits_only_caption(bot, photo):
+    editor = me.MessageEditor()
+    asyncio.run(editor.send(_message(photo), chat_id=1))
+
+    asyncio.run(editor.edit(_message(photo, caption='other')))
+
+    assert bot.calls == ['send_photo', 'edit_message_caption']
+    assert editor.last_edit_method == 'caption'
+
+
+def test_changed_file_edits_media(bot, photo, tmp_path):
+    editor = me.MessageEditor()
+    asyncio.run(editor.send(_message(photo), chat_id=1))
+
+    other = tmp_path / 'other.png'
+    other.write_bytes(b'another file')
+    asyncio.run(editor.edit(_message(str(other))))
+
+    assert bot.calls == ['send_photo', 'edit_message_media']
+    assert editor.last_edit_method == 'media'
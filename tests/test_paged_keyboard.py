@@ -0,0 +1,130 @@
+import asyncio
+import datetime
+import uuid
+from pathlib import Path
+
+import pytest
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from hulio.core import glob
+from hulio.core.classes.callback_codec import CallbackCodec
+from hulio.core.classes.component import Component, PAGINATE_ACTION
+from hulio.core.classes.component_cache import ComponentCache
+from hulio.core.classes.component_registry import ComponentRegistry
+from hulio.core.classes.database_controller import DatabaseController
+from hulio.core.classes.lock_manager import LockManager
+from hulio.core.handlers.callback_dispatcher import CallbackDispatcher
+from hulio.core.handlers.component_handler_decorator import component_handler_decorator
+from hulio.core.interfaces.database import ComponentRecord
+from hulio.core.providers.memory import MemoryStorageProvider
+from template import render
+from template_for_aiogram import aiogram_syntax
+
+TEMPLATE = str(Path(__file__).parent / 'templates' / 'paged.xml')
+
+
+class FakeEditor:
+    def __init__(self):
+        self.edits = []
+
+    async def edit(self, bot, message):
+        self.edits.append(message)
+
+
+editor = FakeEditor()
+
+
+class Shelf(Component, template=TEMPLATE):
+    books: list[str] = []
+
+    @property
+    def message(self) -> FakeEditor:
+        return editor
+
+    def __render__(self, context: dict):
+        return render(TEMPLATE, {**context, 'books': self.books, 'page': self.paged_keyboard_page()},
+                      syntax=aiogram_syntax)
+
+
+@pytest.fixture
+def shelf(monkeypatch):
+    monkeypatch.setattr(editor, 'edits', [])
+
+    registry = ComponentRegistry()
+    registry.register(Shelf.get_component_id(), Shelf)
+    registry.register_action(Shelf.get_component_id(), PAGINATE_ACTION)
+    codec = CallbackCodec(registry)
+    monkeypatch.setattr(glob, 'callback_codec', codec)
+
+    controller = DatabaseController(MemoryStorageProvider())
+    controller.setup()
+    storage = ComponentCache(controller)
+
+    dispatcher = CallbackDispatcher(codec, storage)
+    dispatcher.add(Shelf.get_component_id(), PAGINATE_ACTION, component_handler_decorator(
+        Shelf.__paginate__, Shelf.get_component_id(), storage, registry, LockManager()
+    ))
+
+    component = Shelf(books=['A', 'B', 'C', 'D', 'E'])
+    component.record_id = uuid.uuid4()
+    component.bot_id = 1
+    storage.component_track(ComponentRecord(
+        record_id=component.record_id, parent_record_id=None, message_record_id=uuid.uuid4(),
+        component_id=Shelf.get_component_id(), state_json=component.model_dump_json(), is_enabled=True
+    ))
+    return component, dispatcher
+
+
+def _keyboard(message) -> list[list[str]]:
+    return [[button.text for button in row] for row in message.reply_markup.inline_keyboard]
+
+
+def _click(dispatcher: CallbackDispatcher, callback_data: str):
+    query = CallbackQuery(
+        id='1', from_user=User(id=1, is_bot=False, first_name='User'), chat_instance='1', data=callback_data,
+        message=Message(message_id=1, date=datetime.datetime.now(), chat=Chat(id=1, type='private'))
+    )
+
+    async def click():
+        result = await dispatcher.filter(query, bots=[])
+        assert result
+        await dispatcher.handle(query, bots=[], **result)
+
+    asyncio.run(click())
+
+
+def _next_page_button(message) -> str:
+    navigation = message.reply_markup.inline_keyboard[-1]
+    return navigation[-1].callback_data
+
+
+def test_navigation_rerenders_keyboard(shelf):
+    component, dispatcher = shelf
+    asyncio.run(component.refresh())
+    first = editor.edits[0]
+    assert _keyboard(first) == [['A', 'B'], ['»']]
+
+    _click(dispatcher, _next_page_button(first))
+
+    assert len(editor.edits) == 2
+    assert _keyboard(editor.edits[1]) == [['C', 'D'], ['«', '»']]
+
+
+def test_bad_page_is_ignored(shelf):
+    component, dispatcher = shelf
+
+    for args in ([], ['next'], ['-1'], ['0']):
+        _click(dispatcher, glob.callback_codec.encode(component.record_id, Shelf.get_component_id(),
+                                                      PAGINATE_ACTION, *args))
+
+    assert editor.edits == []
+
+
+def test_pages_are_kept_per_keyboard(shelf):
+    component, _ = shelf
+
+    asyncio.run(component.__paginate__(['2', 'authors']))
+    asyncio.run(component.__paginate__(['1']))
+
+    assert component.paged_keyboard_page('authors') == 2
+    assert component.paged_keyboard_page() == 1
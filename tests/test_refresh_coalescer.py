@@ -0,0 +1,87 @@
+import asyncio
+import logging
+
+from classes.refresh_coalescer import RefreshCoalescer
+
+
+def test_first_refresh_is_not_delayed():
+    async def main():
+        coalescer = RefreshCoalescer()
+        edited = asyncio.Event()
+
+        async def edit():
+            edited.set()
+
+        coalescer.request('message', edit)
+        await asyncio.wait_for(edited.wait(), 0.05)
+
+    asyncio.run(main())
+
+
+def test_refreshes_during_edit_are_merged():
+    async def main():
+        coalescer = RefreshCoalescer()
+        release = asyncio.Event()
+        calls = []
+
+        async def slow_edit():
+            calls.append('first')
+            await release.wait()
+
+        def edit(name):
+            async def _edit():
+                calls.append(name)
+            return _edit
+
+        first = coalescer.request('message', slow_edit)
+        await asyncio.sleep(0)
+
+        second = coalescer.request('message', edit('second'))
+        third = coalescer.request('message', edit('third'))
+        assert second is third
+
+        release.set()
+        await asyncio.gather(first, third)
+
+        assert calls == ['first', 'third']
+        assert coalescer.metrics['edits'] == 2
+        assert coalescer.metrics['coalesced'] == 1
+
+    asyncio.run(main())
+
+
+def test_failed_edit_is_logged(caplog):
+    async def main():
+        coalescer = RefreshCoalescer()
+
+        async def edit():
+            raise RuntimeError('Message is not modified')
+
+        coalescer.request('message', edit)
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+    with caplog.at_level(logging.ERROR, logger='classes.refresh_coalescer'):
+        asyncio.run(main())
+
+    assert 'Unable to refresh message' in caplog.text
+
+
+def test_window_merges_refreshes():
+    async def main():
+        coalescer = RefreshCoalescer(window=0.01)
+        calls = []
+
+        def edit(name):
+            async def _edit():
+                calls.append(name)
+            return _edit
+
+        coalescer.request('message', edit('first'))
+        await asyncio.sleep(0)
+        future = coalescer.request('message', edit('second'))
+        await future
+
+        assert calls == ['second']
+
+    asyncio.run(main())
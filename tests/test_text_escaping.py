@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from template import render
+from template_for_aiogram import aiogram_syntax
+from template_for_aiogram.types import Safe
+
+TEMPLATES = Path(__file__).parent / 'templates'
+
+
+def _render(name: str, context: dict) -> str:
+    return render(str(TEMPLATES / name), context, syntax=aiogram_syntax).text
+
+
+def test_entities_in_literal_text_stay_escaped():
+    assert _render('escaping_static.xml', {}) == 'Fish &amp; chips &lt;b&gt;'
+
+
+def test_literal_and_values_are_escaped():
+    text = _render('escaping.xml', {'counter': 5, 'value': '<i>'})
+    assert text == 'Counter: 5 &amp; a &lt;b&gt; &lt;i&gt;'
+
+
+def test_safe_values_are_not_escaped():
+    text = _render('escaping.xml', {'counter': 5, 'value': Safe('<i>x</i>')})
+    assert text == 'Counter: 5 &amp; a &lt;b&gt; <i>x</i>'
+
+
+def test_heading_is_uppercased_before_escaping():
+    assert _render('heading.xml', {'title': 'Tom'}) == '<b>TOM &amp; JERRY</b>'
+
+
+def test_button_label_is_not_escaped():
+    message = render(str(TEMPLATES / 'button_label.xml'), {'side': 'chips'}, syntax=aiogram_syntax)
+    assert message.reply_markup.inline_keyboard[0][0].text == 'Fish & chips'
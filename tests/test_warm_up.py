@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+import template
+from template import ParsingError
+from template._template import _documents
+
+
+@pytest.fixture(autouse=True)
+def clean_documents():
+    template.clear_document_cache()
+    yield
+    template.clear_document_cache()
+
+
+def test_included_templates_are_parsed(tmp_path):
+    included = tmp_path / 'included.xml'
+    included.write_text('<message>Included</message>')
+    main = tmp_path / 'main.xml'
+    main.write_text(f'<message><template src="{included}"/></message>')
+
+    template.warm_up([main])
+
+    assert {os.path.abspath(main), os.path.abspath(included)} <= set(_documents)
+
+
+def test_syntax_error_is_raised(tmp_path):
+    broken = tmp_path / 'broken.xml'
+    broken.write_text('<message>')
+
+    with pytest.raises(ParsingError):
+        template.warm_up([broken])